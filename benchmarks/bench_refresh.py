@@ -0,0 +1,327 @@
+"""
+Refresh Pipeline Benchmarks for NRCAN Energy Factbook
+
+Times data_retrieval.py against a local StatCan stand-in (statcan_standin.py)
+instead of the live site:
+- fetch:<url function>   fetch_csv_from_url() of one table
+- page:<page>            process_pageNN_data() of one page, downloads included
+- refresh                refresh_all_data() end to end (full rebuild)
+- refresh:full-table     the same from full-table downloads (--source full-table)
+- refresh:vectors        the same with vector-only tables fetched by vector (--vectors)
+
+Every case runs in its own Python process so that peak RSS belongs to that
+case alone. Reported per case: wall time, CPU time, peak RSS and the RSS
+growth over the process after its imports (medians over --repeat runs).
+
+Before timing anything, the refresh is run once in every mode (see
+check_modes) and the run fails if any mode's data.csv or metadata.csv
+differs from a full rebuild.
+
+Usage:
+    python benchmarks/bench_refresh.py                      # scales 1, 10 and 100
+    python benchmarks/bench_refresh.py --scales 1 --repeat 1
+    python benchmarks/bench_refresh.py --json results.json
+    python benchmarks/bench_refresh.py --baseline results.json  # exit 1 on regressions
+    python benchmarks/bench_refresh.py --check-only         # only compare the refresh modes
+    python benchmarks/bench_refresh.py --record             # record live fixtures
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+DEFAULT_SCALES = (1, 10, 100)
+
+# refresh_all_data() options of the refresh:<variant> cases
+REFRESH_VARIANTS = {
+    "full-table": {"source": "full-table"},
+    "vectors": {"vectors": True},
+}
+
+# Relative slowdown (wall time or peak RSS) over the baseline that fails the run
+DEFAULT_TOLERANCE = 0.25
+
+# Files every refresh mode must write identically (see check_modes)
+OUTPUT_FILES = ("data.csv", "metadata.csv")
+
+
+def list_cases():
+    """Every benchmark case name, in report order."""
+    import data_retrieval as dr
+    return ([f"fetch:{get_url.__name__}" for get_url in dr.TABLE_URLS] +
+            [f"page:{page}" for page in dr.PAGE_SPECS] +
+            ["refresh"] + [f"refresh:{variant}" for variant in REFRESH_VARIANTS])
+
+
+def _reset_peak_rss():
+    # Linux only: restart the VmHWM high-water mark from the current RSS
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_mb():
+    # Prefer VmHWM: ru_maxrss on Linux survives exec, so a child would report
+    # the parent's peak (the stand-in holding every fixture body) as its own
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_case(case):
+    """Run one case in this process and return its measurements."""
+    import data_retrieval as dr
+    from functools import partial
+
+    dr.DATA_DIR = tempfile.mkdtemp(prefix="factbook-bench-")
+    dr.PUBLIC_DATA_DIR = None
+    _reset_peak_rss()
+    rss_before = _peak_rss_mb()
+    kind, _, name = case.partition(":")
+
+    if kind == "fetch":
+        get_url = {get_url.__name__: get_url for get_url in dr.TABLE_URLS}[name]
+        run = lambda: len(dr.fetch_csv_from_url(get_url(), cache_mode="off"))
+    elif kind == "page":
+        processor = dr.PAGE_PROCESSORS[list(dr.PAGE_SPECS).index(name)]
+        run = lambda: len(processor(dr.TableCache(partial(dr.fetch_csv_from_url, cache_mode="off")))[0])
+    elif kind == "refresh":
+        options = REFRESH_VARIANTS[name] if name else {}
+        run = lambda: len(dr.refresh_all_data(cache_mode="off", full=True, **options)[0])
+    else:
+        raise ValueError(f"Unknown benchmark case {case!r}")
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        rows = run()
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+    peak = _peak_rss_mb()
+    return {
+        "rows": rows,
+        "wall_s": wall,
+        "cpu_s": cpu,
+        "peak_rss_mb": peak,
+        "rss_growth_mb": None if peak is None else peak - rss_before,
+    }
+
+
+def _refresh_outputs(data_dir, **options):
+    """Run refresh_all_data() quietly into data_dir; returns its data.csv and metadata.csv bytes."""
+    import data_retrieval as dr
+
+    dr.DATA_DIR = data_dir
+    dr.PUBLIC_DATA_DIR = None
+    options = dict({"cache_mode": "off", "check_releases": False, "history": False}, **options)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        dr.refresh_all_data(**options)
+    outputs = []
+    for name in OUTPUT_FILES:
+        with open(os.path.join(data_dir, name), "rb") as f:
+            outputs.append(f.read())
+    return outputs
+
+
+def _age_stored_data(data_dir, years):
+    """Make data_dir's data.csv look like it was refreshed years ago.
+    
+    The latest years of every vector are removed and the values of the year
+    now latest are changed, as if StatCan had revised them since, so only a
+    refresh that re-requests its revision window restores them.
+    """
+    import pandas as pd
+
+    data_path = os.path.join(data_dir, "data.csv")
+    df = pd.read_csv(data_path, float_precision="round_trip")
+    df = df[df["ref_date"] <= df.groupby("vector")["ref_date"].transform("max") - years]
+    revised = df["ref_date"] == df.groupby("vector")["ref_date"].transform("max")
+    df.loc[revised, "value"] += 1
+    df.to_csv(data_path, index=False)
+
+
+def check_modes(scale=1):
+    """Refresh the stand-in in every mode and compare each with a full rebuild.
+    
+    Modes: the REFRESH_VARIANTS sources; an incremental refresh of an aged
+    data.csv (see _age_stored_data); a second full refresh revalidating the response
+    cache; and an incremental refresh skipped on unchanged release times.
+    Returns the differences found, as messages.
+    """
+    from statcan_standin import StatCanStandIn
+
+    problems = []
+    with StatCanStandIn(scale=scale) as standin:
+        served = standin.bytes_served
+        expected = _refresh_outputs(tempfile.mkdtemp(prefix="factbook-check-"), full=True)
+        full_bytes = standin.bytes_served - served
+
+        def compare(mode, outputs):
+            for name, got, want in zip(OUTPUT_FILES, outputs, expected):
+                if got != want:
+                    problems.append(f"{mode}: {name} differs from the full refresh")
+
+        for variant, options in REFRESH_VARIANTS.items():
+            compare(variant, _refresh_outputs(tempfile.mkdtemp(prefix="factbook-check-"), full=True, **options))
+
+        data_dir = tempfile.mkdtemp(prefix="factbook-check-")
+        _refresh_outputs(data_dir, full=True)
+        _age_stored_data(data_dir, 3)
+        served = standin.bytes_served
+        compare("incremental", _refresh_outputs(data_dir))
+        if standin.bytes_served - served >= full_bytes:
+            problems.append("incremental: downloaded as much as the full refresh")
+
+        data_dir = tempfile.mkdtemp(prefix="factbook-check-")
+        _refresh_outputs(data_dir, full=True, cache_mode="revalidate")
+        not_modified = standin.not_modified
+        compare("revalidate", _refresh_outputs(data_dir, full=True, cache_mode="revalidate"))
+        if standin.not_modified == not_modified:
+            problems.append("revalidate: no request was answered with 304 Not Modified")
+
+        data_dir = tempfile.mkdtemp(prefix="factbook-check-")
+        _refresh_outputs(data_dir, full=True, check_releases=True)
+        served = standin.bytes_served
+        compare("release-skip", _refresh_outputs(data_dir, check_releases=True))
+        if standin.bytes_served != served:
+            problems.append("release-skip: tables were downloaded although no release changed")
+    return problems
+
+
+def run_case_process(case, host):
+    """Run one case in a fresh interpreter against the stand-in at host."""
+    env = dict(os.environ, STATCAN_HOST=host)
+    env.pop("STATCAN_WDS_URL", None)
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", case],
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _median(values):
+    values = [value for value in values if value is not None]
+    return statistics.median(values) if values else None
+
+
+def run_benchmarks(scales, cases, repeat):
+    """Run every case at every scale; returns {"<scale>x <case>": summary}."""
+    from statcan_standin import StatCanStandIn
+
+    results = {}
+    for scale in scales:
+        print(f"Preparing {scale}x fixtures...")
+        with StatCanStandIn(scale=scale) as standin:
+            for case in cases:
+                runs = [run_case_process(case, standin.host) for _ in range(repeat)]
+                summary = {key: _median(run[key] for run in runs)
+                           for key in ("wall_s", "cpu_s", "peak_rss_mb", "rss_growth_mb")}
+                summary["rows"] = runs[0]["rows"]
+                summary["scale"] = scale
+                results[f"{scale}x {case}"] = summary
+                print(format_result(f"{scale}x {case}", summary))
+    return results
+
+
+def _fmt(value, spec):
+    return "n/a" if value is None else format(value, spec)
+
+
+def format_result(key, summary):
+    return (f"  {key:<48} rows {summary['rows']:>7}  wall {_fmt(summary['wall_s'], '8.3f')}s  "
+            f"cpu {_fmt(summary['cpu_s'], '8.3f')}s  peak RSS {_fmt(summary['peak_rss_mb'], '7.1f')} MB  "
+            f"(+{_fmt(summary['rss_growth_mb'], '.1f')} MB)")
+
+
+def find_regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Cases whose wall time or peak RSS grew by more than tolerance over baseline."""
+    regressions = []
+    for key, summary in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        for metric in ("wall_s", "peak_rss_mb"):
+            old, new = before.get(metric), summary.get(metric)
+            if old and new is not None and new > old * (1 + tolerance):
+                regressions.append(f"{key}: {metric} {old:.3f} -> {new:.3f} (+{new / old - 1:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the StatCan refresh pipeline offline.")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(DEFAULT_SCALES),
+                        help="Fixture enlargement factors (default: 1 10 100)")
+    parser.add_argument("--cases", nargs="+",
+                        help="Only run these cases (e.g. refresh page:page24 fetch:get_infrastructure_url)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Runs per case; the median is reported (default: 3)")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare with a previous --json file and exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"Allowed slowdown over the baseline (default: {DEFAULT_TOLERANCE:.0%})")
+    parser.add_argument("--no-check", dest="check", action="store_false",
+                        help="Do not compare the outputs of the refresh modes before timing")
+    parser.add_argument("--check-only", action="store_true",
+                        help="Only compare the outputs of the refresh modes, then exit")
+    parser.add_argument("--record", action="store_true",
+                        help="Download live StatCan tables into benchmarks/fixtures/, then exit")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_case(args.child)))
+        return 0
+    if args.record:
+        from statcan_standin import record_fixtures
+        record_fixtures()
+        return 0
+    if args.check or args.check_only:
+        print("Comparing refresh modes...")
+        problems = check_modes(min(args.scales))
+        for problem in problems:
+            print(f"MISMATCH {problem}")
+        if problems:
+            return 1
+        print("Every refresh mode matches the full refresh")
+        if args.check_only:
+            return 0
+
+    results = run_benchmarks(args.scales, args.cases or list_cases(), args.repeat)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print("No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
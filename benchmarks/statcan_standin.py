@@ -0,0 +1,423 @@
+"""
+Local StatCan Stand-in for the Refresh Benchmarks
+
+Serves fixture CSVs for the seven get_*_url() downloads of data_retrieval.py,
+full-table zips built from them (--source full-table), and WDS
+getCubeMetadata and getDataFromVectorByReferencePeriodRange calls (--vectors), so the refresh pipeline can run without touching the live StatCan site.
+
+Like StatCan, a table query only returns the years between its startDate and
+endDate, so incremental refreshes download less than full ones. Every GET
+response carries an ETag and a Last-Modified (the release time), and
+conditional requests that still match are answered with 304 Not Modified.
+
+Fixtures are looked up in benchmarks/fixtures/<url function>.csv. Recorded
+fixtures are written there by `python benchmarks/bench_refresh.py --record`;
+any that are missing are generated as seeded synthetic tables in StatCan's CSV
+layout. A fixture can be enlarged by a whole factor: the extra rows belong to
+filler members that no page selects, so page output stays the same at every
+scale while the parse and filter work grows with it.
+"""
+
+import csv
+import email.utils
+import hashlib
+import io
+import itertools
+import json
+import os
+import sys
+import threading
+import urllib.parse
+import zipfile
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_retrieval as dr
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# The downloads served by the stand-in, in TABLE_URLS order
+URL_FUNCTIONS = {get_url.__name__: get_url for get_url in dr.TABLE_URLS}
+
+NAICS = dr.NAICS_COL
+
+# Synthetic table layouts: years, dimension members and how to name vectors
+SYNTHETIC_TABLES = {
+    'get_capital_expenditures_url': {
+        'years': range(2007, 2025),
+        'dims': {
+            'Capital and repair expenditures': ['Capital expenditures', 'Repair expenditures'],
+            NAICS: ['Oil and gas extraction [211]',
+                    'Support activities for mining, and oil and gas extraction [213]',
+                    'Electric power generation, transmission and distribution [2211]',
+                    'Natural gas distribution [2212]',
+                    'Petroleum and coal product manufacturing [324]',
+                    'Pipeline transportation [486]',
+                    'Mining and quarrying (except oil and gas) [212]',
+                    'Utilities [22]'],
+        },
+    },
+    'get_infrastructure_url': {
+        'years': range(2007, 2024),
+        'dims': {'Asset function': list(dr.INFRA_VECTORS)},
+        'vectors': dr.INFRA_VECTORS,
+    },
+    'get_economic_contributions_url': {
+        'years': range(2007, 2023),
+        'dims': {'Economic contribution': list(dr.ECON_VECTORS)},
+        'vectors': dr.ECON_VECTORS,
+    },
+    'get_investment_by_asset_url': {
+        'years': range(2007, 2024),
+        'dims': {'Asset': [matchers['Asset'] for matchers in
+                           dr.PAGE_SPECS['page27']['sources'][0]['series'].values()]},
+    },
+    'get_international_investment_url': {
+        'years': range(2007, 2024),
+        'dims': {
+            NAICS: dr.ENERGY_INDUSTRIES + ['All industries'],
+            'Canadian and foreign direct investment': ['Canadian direct investment abroad',
+                                                       'Foreign direct investment in Canada'],
+        },
+    },
+    'get_foreign_control_url': {
+        'years': range(2010, 2024),
+        'dims': {NAICS: ['Total non-financial industries (excluding management of companies and enterprises)',
+                         'Oil and gas extraction and support activities [211, 213]',
+                         'Utilities [22]']},
+    },
+    'get_environmental_protection_url': {
+        'years': [2018, 2020, 2022],
+        'dims': {
+            'Industries': list(dr.ENV_INDUSTRIES.values()),
+            'Environmental protection activities': list(dr.ENV_ACTIVITIES.values()),
+            'Expenditures': ['Total, expenditures', 'Capital expenditures', 'Operating expenditures'],
+        },
+    },
+}
+
+TRAILING_COLUMNS = ['UOM', 'UOM_ID', 'SCALAR_FACTOR', 'SCALAR_ID', 'VECTOR', 'COORDINATE',
+                    'VALUE', 'STATUS', 'SYMBOL', 'TERMINATED', 'DECIMALS']
+
+
+def _csv_field(value):
+    value = str(value)
+    return f'"{value}"' if ',' in value or '"' in value else value
+
+
+def _synthetic_value(year, combo):
+    seed = zlib.crc32('|'.join([str(year), *combo]).encode("utf-8"))
+    return round(10 + seed % 5_000_000 / 100, 1)
+
+
+def synthetic_fixture(name, scale=1):
+    """Build a synthetic fixture CSV (as text) for one URL function.
+    
+    Values are derived from each row's year and members, so every scale
+    serves the same values for the members the pages select.
+    """
+    layout = SYNTHETIC_TABLES[name]
+    dims = layout['dims']
+    first_dim = next(iter(dims))
+    header = ['REF_DATE', 'GEO', 'DGUID'] + list(dims) + TRAILING_COLUMNS
+    lines = [','.join(_csv_field(column) for column in header)]
+
+    members = dict(dims)
+    fillers = [f'Synthetic filler member {i}' for i in range((scale - 1) * len(dims[first_dim]))]
+    members[first_dim] = list(dims[first_dim]) + fillers
+    combos = list(itertools.product(*members.values()))
+    # Tables read by VECTOR name their first-dimension members after the vector keys
+    known_vectors = layout.get('vectors', {})
+    vector_ids = {combo: known_vectors.get(combo[0]) or f'v9{index:08d}'
+                  for index, combo in enumerate(combos)}
+
+    for year in layout['years']:
+        for combo in combos:
+            coordinate = '1.' + '.'.join(str(members[dim].index(label) + 1)
+                                         for dim, label in zip(members, combo))
+            row = [year, 'Canada', '2016A000011124'] + list(combo) + [
+                'Dollars', 81, 'millions', 6, vector_ids[combo], coordinate,
+                _synthetic_value(year, combo), '', '', '', 1,
+            ]
+            lines.append(','.join(_csv_field(value) for value in row))
+    return '\n'.join(lines) + '\n'
+
+
+def enlarge_fixture(text, scale):
+    """Enlarge a recorded fixture by appending scale - 1 filler copies of its rows.
+    
+    Every member label and vector of a copy is renamed, so no page selects it.
+    """
+    df = pd.read_csv(io.StringIO(text), dtype=str, keep_default_na=False)
+    dims = list(df.columns[df.columns.get_loc('DGUID') + 1:df.columns.get_loc('UOM')])
+    copies = [df]
+    for copy in range(1, scale):
+        filler = df.copy()
+        for dim in dims:
+            filler[dim] = f'Synthetic filler {copy} member ' + pd.Series(pd.factorize(df[dim])[0], index=df.index).astype(str)
+        filler['VECTOR'] = f'v9{copy:03d}' + df['VECTOR'].str.lstrip('v')
+        copies.append(filler)
+    return pd.concat(copies).to_csv(index=False)
+
+
+def load_fixture(name, scale=1):
+    """Fixture CSV text for a URL function at the given scale."""
+    path = os.path.join(FIXTURE_DIR, f"{name}.csv")
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        return text if scale == 1 else enlarge_fixture(text, scale)
+    return synthetic_fixture(name, scale)
+
+
+def full_table_fixture(pid, scale=1):
+    """Build the full-table CSV zip of one table (as bytes) from its URL fixtures.
+    
+    Each fixture's rows get a COORDINATE inside its URL's member selection.
+    Every row is also repeated for a second geography and for a year before
+    the URL's startDate; both copies fall outside the selection, so a reader
+    that does not apply it produces different page output.
+    """
+    frames = []
+    parents = {}
+    for name, get_url in URL_FUNCTIONS.items():
+        url = get_url()
+        if dr.table_product_id(url) != pid:
+            continue
+        _, params, selection = dr.parse_member_selection(url)
+        members = []
+        for dim, (ids, _) in enumerate(selection):
+            # Member 1 is each dimension's root (level 1); selected ids hang below it
+            member = min(ids) if ids else 1
+            members.append(member)
+            parents.setdefault(dim, {1: None}).setdefault(member, None if member == 1 else 1)
+        parents[0][2] = 1
+        df = pd.read_csv(io.StringIO(load_fixture(name, scale)), dtype=str, keep_default_na=False)
+        df['COORDINATE'] = '.'.join(map(str, members))
+        province = df.assign(GEO='Synthetic province', COORDINATE='.'.join(map(str, [2] + members[1:])))
+        earlier = df.assign(REF_DATE=str(int(dict(params)['startDate'][:4]) - 5))
+        frames += [df, province, earlier]
+    
+    metadata = io.StringIO()
+    writer = csv.writer(metadata, quoting=csv.QUOTE_ALL, lineterminator='\n')
+    writer.writerows([['Cube Title', 'Product Id'], ['Synthetic table', pid], []])
+    writer.writerow(['Dimension ID', 'Member Name', 'Classification Code', 'Member ID', 'Parent Member ID', 'Terminated'])
+    for dim, members in parents.items():
+        for member, parent in members.items():
+            writer.writerow([dim + 1, f'Member {member}', '', member, parent or '', ''])
+    
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(f'{pid}.csv', '\ufeff' + pd.concat(frames).to_csv(index=False))
+        zf.writestr(f'{pid}_MetaData.csv', '\ufeff' + metadata.getvalue())
+    return archive.getvalue()
+
+
+def vector_fixtures(scale=1):
+    """{vector id: [(REF_DATE, VALUE or None)]} of every fixture row, for WDS vector calls."""
+    points = {}
+    for name in URL_FUNCTIONS:
+        df = pd.read_csv(io.StringIO(load_fixture(name, scale)), dtype=str, keep_default_na=False)
+        for vector, ref_date, value in zip(df['VECTOR'], df['REF_DATE'], df['VALUE']):
+            points.setdefault(vector.lstrip('v'), []).append((ref_date, float(value) if value else None))
+    return points
+
+
+def vector_response(points, query):
+    """JSON body of a getDataFromVectorByReferencePeriodRange call."""
+    params = urllib.parse.parse_qs(query)
+    start = params.get('startRefPeriod', [''])[0]
+    end = params.get('endReferencePeriod', ['9999'])[0]
+    response = []
+    for vector_id in params.get('vectorIds', [''])[0].replace('"', '').split(','):
+        if vector_id not in points:
+            response.append({"status": "FAILED", "object": f"Vector {vector_id} not found"})
+            continue
+        response.append({"status": "SUCCESS", "object": {
+            "vectorId": int(vector_id),
+            "vectorDataPoint": [
+                {"refPer": f"{ref_date}-01-01", "value": value, "frequencyCode": 12}
+                for ref_date, value in points[vector_id] if start <= f"{ref_date}-01-01" <= end
+            ],
+        }})
+    return json.dumps(response).encode("utf-8")
+
+
+def select_years(body, start, end):
+    """Rows of a fixture CSV body (bytes) whose REF_DATE year is in [start, end]."""
+    header, _, rows = body.partition(b'\n')
+    kept = [row for row in rows.split(b'\n') if row and start <= int(row.lstrip(b'"')[:4]) <= end]
+    return b'\n'.join([header, *kept, b''])
+
+
+def _query_years(path):
+    """(start, end) years of a table query's startDate and endDate."""
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(path).query)
+    start = query.get('startDate', ['0000'])[0][:4]
+    end = query.get('endDate', ['9999'])[0][:4]
+    return int(start), int(end)
+
+
+def record_fixtures():
+    """Download every table from the live StatCan site into FIXTURE_DIR."""
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    for name, get_url in URL_FUNCTIONS.items():
+        print(f"Recording {name}...")
+        stream, encoding = dr.open_csv_stream(get_url(), cache_mode="off")
+        with stream, open(os.path.join(FIXTURE_DIR, f"{name}.csv"), "w", encoding="utf-8") as f:
+            f.write(stream.read().decode(encoding, errors="replace"))
+
+
+def _route_key(url):
+    """Match a download URL to its fixture by table id and member selection."""
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)
+    return query.get('pid', [''])[0], query.get('selectedMembers', [''])[0]
+
+
+class StatCanStandIn:
+    """Threaded local HTTP server standing in for www150.statcan.gc.ca.
+
+    Use as a context manager; while it runs, data_retrieval.STATCAN_HOST
+    points at it and `host` can be handed to other processes. Every full-history
+    body is built on entry, so no fixture work happens while full refreshes
+    are timed; the shorter selections of incremental refreshes are cut from
+    them on first request.
+    """
+
+    def __init__(self, scale=1, release_time="2024-01-01T08:30"):
+        self.scale = scale
+        self.release_time = release_time
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_served = 0
+        self._bodies = {}
+        self._selections = {}
+        self._zips = {}
+        self._vectors = None
+        self._routes = {_route_key(get_url()): name for name, get_url in URL_FUNCTIONS.items()}
+        self._pids = {dr.table_product_id(get_url()) for get_url in URL_FUNCTIONS.values()}
+        self._server = None
+        self._previous_host = None
+        self.host = None
+
+    def body(self, name):
+        if name not in self._bodies:
+            self._bodies[name] = load_fixture(name, self.scale).encode("utf-8")
+        return self._bodies[name]
+
+    def selection(self, name, start, end):
+        """The body of a table query limited to its startDate and endDate years."""
+        key = (name, start, end)
+        if key not in self._selections:
+            self._selections[key] = select_years(self.body(name), start, end)
+        return self._selections[key]
+
+    @property
+    def last_modified(self):
+        released = datetime.fromisoformat(self.release_time).replace(tzinfo=timezone.utc)
+        return email.utils.format_datetime(released, usegmt=True)
+
+    def is_not_modified(self, headers, etag):
+        """Whether a request's If-None-Match or If-Modified-Since still matches."""
+        if headers.get("If-None-Match"):
+            return etag in [tag.strip() for tag in headers["If-None-Match"].split(",")]
+        if headers.get("If-Modified-Since"):
+            try:
+                since = email.utils.parsedate_to_datetime(headers["If-Modified-Since"])
+            except (TypeError, ValueError):
+                return False
+            return since >= email.utils.parsedate_to_datetime(self.last_modified)
+        return False
+
+    def full_table(self, pid):
+        if pid not in self._zips:
+            self._zips[pid] = full_table_fixture(pid, self.scale)
+        return self._zips[pid]
+    
+    def vector_points(self):
+        if self._vectors is None:
+            self._vectors = vector_fixtures(self.scale)
+        return self._vectors
+    
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                standin.requests += 1
+                path, _, query = self.path.partition("?")
+                if path.endswith("/getDataFromVectorByReferencePeriodRange"):
+                    body, content_type = vector_response(standin.vector_points(), query), "application/json"
+                elif self.path.startswith("/n1/tbl/csv/"):
+                    pid = self.path.rsplit("/", 1)[-1].split("-")[0]
+                    if pid not in standin._pids:
+                        self.send_error(404)
+                        return
+                    body, content_type = standin.full_table(pid), "application/zip"
+                else:
+                    name = standin._routes.get(_route_key(self.path))
+                    if name is None:
+                        self.send_error(404)
+                        return
+                    body = standin.selection(name, *_query_years(self.path))
+                    content_type = "text/csv; charset=utf-8"
+                etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+                if standin.is_not_modified(self.headers, etag):
+                    standin.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                standin.bytes_served += len(body)
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", standin.last_modified)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                standin.requests += 1
+                if not self.path.endswith("/getCubeMetadata"):
+                    self.send_error(404)
+                    return
+                cubes = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                body = json.dumps([
+                    {"status": "SUCCESS",
+                     "object": {"productId": str(cube["productId"]), "releaseTime": standin.release_time}}
+                    for cube in cubes
+                ]).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        for name, get_url in URL_FUNCTIONS.items():
+            self.selection(name, *_query_years(get_url()))
+        for pid in self._pids:
+            self.full_table(pid)
+        self.vector_points()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self.host = f"http://127.0.0.1:{self._server.server_port}"
+        self._previous_host = dr.STATCAN_HOST
+        dr.STATCAN_HOST = self.host
+        return self
+
+    def __exit__(self, *exc_info):
+        dr.STATCAN_HOST = self._previous_host
+        self._server.shutdown()
+        self._server.server_close()
@@ -15,16 +15,48 @@ The data is pre-calculated and stored with virtual vectors like:
 - page24_oil_gas, page24_electricity, page24_other, page24_total
 - page25_fuel_energy_pipelines, page25_transport, etc.
 - page26_jobs, page26_employment_income, page26_gdp, page26_investment_value
+
+Pages are declared in PAGE_SPECS; adding a page is a new spec entry.
 """
 
 import requests
+import numpy as np
 import pandas as pd
+import argparse
+import csv
+import gzip
+import hashlib
+import importlib.util
 import io
+import json
 import os
+import random
+import re
+import multiprocessing
+import sqlite3
+import sys
+import threading
+import time
+import urllib.parse
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from functools import partial
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
 
 # Data directory
 DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "statcan_data")
 
+# Copy of the published files served by the frontend (None to not publish one)
+PUBLIC_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "public", "statcan_data")
+
 # =============================================================================
 # STATCAN URLS
 # =============================================================================
@@ -32,18 +64,22 @@ DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "statcan_dat
 # data is returned. The API returns whatever data exists up to the current date,
 # regardless of the end date specified. This approach ensures new data is
 # automatically included when StatCan publishes it.
+#
+# STATCAN_HOST can be pointed at a local stand-in server (see benchmarks/).
+
+STATCAN_HOST = os.environ.get("STATCAN_HOST", "https://www150.statcan.gc.ca")
 
 def get_capital_expenditures_url():
     """Get capital expenditures URL (Table 34-10-0036-01)."""
-    return "https://www150.statcan.gc.ca/t1/tbl1/en/dtl!downloadDbLoadingData.action?pid=3410003601&latestN=0&startDate=20070101&endDate=20301231&csvLocale=en&selectedMembers=%5B%5B%5D%2C%5B1%5D%2C%5B8%2C9%2C11%2C34%2C36%2C37%2C50%2C91%5D%5D&checkedLevels=0D1"
+    return f"{STATCAN_HOST}/t1/tbl1/en/dtl!downloadDbLoadingData.action?pid=3410003601&latestN=0&startDate=20070101&endDate=20301231&csvLocale=en&selectedMembers=%5B%5B%5D%2C%5B1%5D%2C%5B8%2C9%2C11%2C34%2C36%2C37%2C50%2C91%5D%5D&checkedLevels=0D1"
 
 def get_infrastructure_url():
     """Get infrastructure URL (Table 36-10-0608-01)."""
-    return "https://www150.statcan.gc.ca/t1/tbl1/en/dtl!downloadDbLoadingData.action?pid=3610060801&latestN=0&startDate=20070101&endDate=20301231&csvLocale=en&selectedMembers=%5B%5B%5D%2C%5B3%5D%2C%5B1%5D%2C%5B%5D%2C%5B48%5D%2C%5B%5D%5D&checkedLevels=0D1%2C3D1%2C4D1%2C5D1%2C5D2"
+    return f"{STATCAN_HOST}/t1/tbl1/en/dtl!downloadDbLoadingData.action?pid=3610060801&latestN=0&startDate=20070101&endDate=20301231&csvLocale=en&selectedMembers=%5B%5B%5D%2C%5B3%5D%2C%5B1%5D%2C%5B%5D%2C%5B48%5D%2C%5B%5D%5D&checkedLevels=0D1%2C3D1%2C4D1%2C5D1%2C5D2"
 
 def get_economic_contributions_url():
     """Get economic contributions URL (Table 36-10-0610-01)."""
-    return "https://www150.statcan.gc.ca/t1/tbl1/en/dtl!downloadDbLoadingData.action?pid=3610061001&latestN=0&startDate=20070101&endDate=20301231&csvLocale=en&selectedMembers=%5B%5B%5D%2C%5B%5D%2C%5B%5D%2C%5B%5D%2C%5B39%2C48%2C54%2C55%2C57%5D%2C%5B%5D%5D&checkedLevels=0D1%2C1D1%2C2D1%2C3D1%2C5D1"
+    return f"{STATCAN_HOST}/t1/tbl1/en/dtl!downloadDbLoadingData.action?pid=3610061001&latestN=0&startDate=20070101&endDate=20301231&csvLocale=en&selectedMembers=%5B%5B%5D%2C%5B%5D%2C%5B%5D%2C%5B%5D%2C%5B39%2C48%2C54%2C55%2C57%5D%2C%5B%5D%5D&checkedLevels=0D1%2C1D1%2C2D1%2C3D1%2C5D1"
 
 def get_international_investment_url():
     """Get international investment URL (Table 36-10-0009-01).
@@ -51,7 +87,43 @@ def get_international_investment_url():
     Returns FDI (Foreign Direct Investment) and CDIA (Canadian Direct Investment Abroad)
     for energy-related industries.
     """
-    return "https://www150.statcan.gc.ca/t1/tbl1/en/dtl!downloadDbLoadingData.action?pid=3610000901&latestN=0&startDate=20070101&endDate=20301212&csvLocale=en&selectedMembers=%5B%5B%5D%2C%5B1%2C16%2C18%2C19%2C30%5D%2C%5B%5D%2C%5B%5D%5D&checkedLevels=0D1%2C2D1%2C3D1"
+    return f"{STATCAN_HOST}/t1/tbl1/en/dtl!downloadDbLoadingData.action?pid=3610000901&latestN=0&startDate=20070101&endDate=20301212&csvLocale=en&selectedMembers=%5B%5B%5D%2C%5B1%2C16%2C18%2C19%2C30%5D%2C%5B%5D%2C%5B%5D%5D&checkedLevels=0D1%2C2D1%2C3D1"
+
+def get_investment_by_asset_url():
+    """Get investment by asset type URL (Table 36-10-0608-01) with detailed asset breakdown."""
+    # This URL fetches investment data with detailed asset type breakdown
+    # Asset indices: 40=Wind/Solar, 41=Steam, 42=Nuclear, 43=Hydraulic, 44=Other electric, 
+    # 45=Transmission lines, 46=Distribution lines, 48=Pipelines, 57=Transformers
+    return f"{STATCAN_HOST}/t1/tbl1/en/dtl!downloadDbLoadingData.action?pid=3610060801&latestN=0&startDate=20070101&endDate=20301231&csvLocale=en&selectedMembers=%5B%5B%5D%2C%5B1%5D%2C%5B2%5D%2C%5B%5D%2C%5B40%2C41%2C42%2C43%2C44%2C45%2C46%2C48%2C57%5D%2C%5B%5D%5D&checkedLevels=0D1%2C3D1%2C5D1"
+
+def get_environmental_protection_url():
+    """Get environmental protection expenditures URL (Table 38-10-0130-01).
+    
+    Returns data for:
+    - Oil and gas extraction [211]
+    - Electric power generation [2211]
+    - Petroleum and coal product manufacturing [324]
+    - Total industries
+    
+    Environmental activities:
+    - Total, environmental protection activities
+    - Solid waste management
+    - Wastewater management
+    - Air pollution management
+    - Protection and remediation of soil, groundwater and surface water
+    - Other environmental protection activities
+    """
+    return f"{STATCAN_HOST}/t1/tbl1/en/dtl!downloadDbLoadingData.action?pid=3810013001&latestN=0&startDate=20070101&endDate=20301212&csvLocale=en&selectedMembers=%5B%5B%5D%2C%5B%5D%2C%5B3%2C5%2C6%2C11%5D%2C%5B12%2C13%2C14%2C15%5D%5D&checkedLevels=0D1%2C1D1%2C2D1%2C3D1%2C3D2"
+
+def get_foreign_control_url():
+    """Get foreign control URL (Table 33-10-0570-01).
+    
+    Returns percentage of total assets under foreign control for:
+    - Total non-financial industries
+    - Oil and gas extraction and support activities [211, 213]
+    - Utilities [22]
+    """
+    return f"{STATCAN_HOST}/t1/tbl1/en/dtl!downloadDbLoadingData.action?pid=3310057001&latestN=0&startDate=20100101&endDate=20301212&csvLocale=en&selectedMembers=%5B%5B%5D%2C%5B3%2C9%2C11%5D%2C%5B2%5D%2C%5B2%5D%5D&checkedLevels=0D1"
 
 # =============================================================================
 # VECTOR MAPPINGS
@@ -101,745 +173,2799 @@ def get_data_paths():
     )
 
 
-def fetch_csv_from_url(url, timeout=120):
-    """Fetch CSV data from a URL and return as DataFrame."""
-    print(f"Fetching data from StatCan...")
-    response = requests.get(url, timeout=timeout)
-    response.raise_for_status()
-    return pd.read_csv(io.StringIO(response.text))
+def get_publish_dirs():
+    """Directories every published file is written to: DATA_DIR and PUBLIC_DATA_DIR."""
+    data_dirs = [get_data_dir()]
+    if PUBLIC_DATA_DIR and os.path.abspath(PUBLIC_DATA_DIR) != os.path.abspath(data_dirs[0]):
+        os.makedirs(PUBLIC_DATA_DIR, exist_ok=True)
+        data_dirs.append(PUBLIC_DATA_DIR)
+    return data_dirs
 
 
-# =============================================================================
-# PAGE 24: CAPITAL EXPENDITURES
-# =============================================================================
+def _fsync_dir(path):
+    # Make a rename durable; directories cannot be opened (or fsynced) on Windows
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
 
-def process_page24_data():
-    """
-    Fetch capital expenditures data from StatCan and process for Page 24.
+
+def write_if_changed(path, content):
+    """Atomically write bytes to path unless its SHA-256 already matches.
     
-    Returns list of tuples: (vector, year, value) for data.csv
-    and list of tuples: (vector, title, uom, scalar_factor) for metadata.csv
+    The content goes to a temporary file next to path, is fsynced and then
+    renamed over it, so readers see the old or the new file but never a
+    truncated one. An unchanged file keeps its mtime. Returns True if written.
     """
-    print("Processing Page 24: Capital Expenditures...")
-    
-    df = fetch_csv_from_url(get_capital_expenditures_url())
-    
-    # Filter for capital expenditures only
-    df = df[df['Capital and repair expenditures'] == 'Capital expenditures'].copy()
-    df['year'] = pd.to_numeric(df['REF_DATE'], errors='coerce')
-    
-    years = sorted(df['year'].dropna().unique())
-    naics_col = 'North American Industry Classification System (NAICS)'
-    
-    data_rows = []
+    if os.path.exists(path) and file_sha256(path) == hashlib.sha256(content).hexdigest():
+        return False
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _fsync_dir(os.path.dirname(path) or ".")
+    return True
+
+
+def write_json_atomic(path, content, sort_keys=False):
+    """Write content as indented JSON to path with write_if_changed. Returns True if written."""
+    return write_if_changed(path, json.dumps(content, indent=2, sort_keys=sort_keys).encode("utf-8"))
+
+
+# Suffixes of every pre-compressed copy a published file can have
+COMPRESSED_SUFFIXES = (".gz", ".br")
+
+
+def get_compressors():
+    """{suffix: compress function} for the pre-compressed copies of published files.
     
-    for year in years:
-        year_df = df[df['year'] == year]
-        
-        # Oil and gas extraction [211]
-        oil_gas_mask = year_df[naics_col].str.match(r'^Oil and gas extraction \[211\]$', na=False)
-        oil_gas = year_df.loc[oil_gas_mask, 'VALUE'].sum()
-        
-        # Electric power generation, transmission and distribution [2211]
-        elec_mask = year_df[naics_col].str.contains(r'\[2211\]', regex=True, na=False)
-        electricity = year_df.loc[elec_mask, 'VALUE'].sum()
-        
-        # Other: [213], [2212], [324], [486]
-        other_mask = year_df[naics_col].str.contains(r'\[213\]|\[2212\]|\[324\]|\[486\]', regex=True, na=False)
-        other = year_df.loc[other_mask, 'VALUE'].sum()
-        
-        total = oil_gas + electricity + other
-        
-        if total > 0:
-            year_int = int(year)
-            data_rows.extend([
-                ('page24_oil_gas', year_int, round(oil_gas, 1)),
-                ('page24_electricity', year_int, round(electricity, 1)),
-                ('page24_other', year_int, round(other, 1)),
-                ('page24_total', year_int, round(total, 1)),
-            ])
+    gzip is always available; brotli only with the optional brotli package.
+    Both run at maximum compression and are deterministic (gzip without a
+    timestamp), so unchanged content gives unchanged bytes.
+    """
+    compressors = {".gz": lambda content: gzip.compress(content, compresslevel=9, mtime=0)}
+    if importlib.util.find_spec("brotli") is not None:
+        import brotli
+        compressors[".br"] = lambda content: brotli.compress(content, quality=11)
+    return compressors
+
+
+def publish_file(file_name, content, data_dirs=None):
+    """Write a published file and its .gz/.br copies to every publish directory.
     
-    # Metadata
-    metadata_rows = [
-        ('page24_oil_gas', 'Capital expenditures - Oil and gas extraction', 'Millions of dollars', 'millions'),
-        ('page24_electricity', 'Capital expenditures - Electric power', 'Millions of dollars', 'millions'),
-        ('page24_other', 'Capital expenditures - Other energy', 'Millions of dollars', 'millions'),
-        ('page24_total', 'Capital expenditures - Total energy sector', 'Millions of dollars', 'millions'),
-    ]
+    data_dirs defaults to get_publish_dirs(). Copies are only recompressed
+    when the file changed or a copy is missing. Copies whose compressor is
+    unavailable (brotli not installed) are deleted, so they never serve
+    outdated content. Returns the paths that were actually written.
+    """
+    written = []
+    compressed = {}
+    compressors = get_compressors()
+    for data_dir in data_dirs or get_publish_dirs():
+        path = os.path.join(data_dir, file_name)
+        changed = write_if_changed(path, content)
+        if changed:
+            written.append(path)
+        for suffix in COMPRESSED_SUFFIXES:
+            if suffix not in compressors and os.path.exists(path + suffix):
+                print(f"  Removing {os.path.basename(path + suffix)}: no {suffix} compressor available")
+                os.remove(path + suffix)
+        for suffix, compress in compressors.items():
+            if changed or not os.path.exists(path + suffix):
+                if suffix not in compressed:
+                    compressed[suffix] = compress(content)
+                if write_if_changed(path + suffix, compressed[suffix]):
+                    written.append(path + suffix)
+    return written
+
+
+def compression_summary(file_names, data_dir=None):
+    """Sizes of published files and their compressed copies, for the run report.
     
-    print(f"  Page 24: {len(data_rows)} data rows")
-    return data_rows, metadata_rows
+    Returns {file_name: {'bytes': n, 'gz': n, 'br': n}}; missing copies and
+    copies without an available compressor are left out.
+    """
+    data_dir = data_dir or get_data_dir()
+    suffixes = list(get_compressors())
+    summary = {}
+    for file_name in file_names:
+        path = os.path.join(data_dir, file_name)
+        if not os.path.exists(path):
+            continue
+        sizes = {'bytes': os.path.getsize(path)}
+        for suffix in suffixes:
+            if os.path.exists(path + suffix):
+                sizes[suffix[1:]] = os.path.getsize(path + suffix)
+        summary[file_name] = sizes
+    return summary
+
+
+def print_compression_summary(summary):
+    total = {}
+    for file_name, sizes in summary.items():
+        for key, size in sizes.items():
+            total[key] = total.get(key, 0) + size
+    for file_name, sizes in list(summary.items()) + [("total", total)]:
+        line = f"  {file_name:<14} {sizes['bytes']:>10,} B"
+        for key in ("gz", "br"):
+            if key in sizes:
+                line += f"  {key} {sizes[key]:>9,} B ({sizes[key] / max(sizes['bytes'], 1):.0%})"
+        print(line)
 
 
 # =============================================================================
-# PAGE 25: INFRASTRUCTURE STOCK
+# HTTP SESSION
 # =============================================================================
+# Every StatCan request goes through one pooled requests.Session, so refreshes
+# reuse keep-alive connections instead of opening one per table. Connection
+# errors and transient HTTP statuses are retried a bounded number of times with
+# jittered exponential backoff. A Deadline caps the total time of a refresh, so
+# one hung or throttling endpoint cannot stall the job: its requests go through
+# a session of their own whose retries never wait past it.
 
-def process_page25_data():
-    """
-    Fetch infrastructure stock data from StatCan and process for Page 25.
+# Retries per request and the backoff between them (seconds: factor * 2^n, capped)
+HTTP_RETRIES = 4
+RETRY_BACKOFF_FACTOR = 1.0
+RETRY_BACKOFF_MAX = 30.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Longest wait for a Retry-After header (seconds); longer ones are cut to it
+RETRY_AFTER_MAX = 5 * 60
+
+# Connections kept open per host
+HTTP_POOL_SIZE = 16
+
+# Default total time budget of refresh_all_data() in seconds
+REFRESH_DEADLINE = 30 * 60
+
+# Default time budget of one page in seconds, counted from its first download
+PAGE_DEADLINE = 10 * 60
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class JitteredRetry(Retry):
+    """urllib3 Retry with "full jitter": each backoff is uniform in [0, capped backoff].
     
-    Returns list of tuples for data.csv and metadata.csv
+    Retry-After waits are capped at RETRY_AFTER_MAX. With a deadline, no
+    wait runs past it, no retry starts once it is spent, and a wait that
+    spends it raises DeadlineExceeded.
     """
-    print("Processing Page 25: Infrastructure Stock...")
     
-    df = fetch_csv_from_url(get_infrastructure_url())
+    def __init__(self, *args, deadline=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.deadline = deadline
     
-    # Build vector to value mapping by year
-    all_vectors = list(INFRA_VECTORS.values())
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.deadline = self.deadline
+        return retry
     
-    # Filter for our vectors
-    df_filtered = df[df['VECTOR'].isin(all_vectors)].copy()
-    df_filtered['year'] = pd.to_numeric(df_filtered['REF_DATE'], errors='coerce')
+    def _cap(self, seconds):
+        if self.deadline is not None:
+            seconds = min(seconds, max(self.deadline.remaining(), 0))
+        return seconds
     
-    years = sorted(df_filtered['year'].dropna().unique())
-    data_rows = []
+    def get_backoff_time(self):
+        backoff = min(super().get_backoff_time(), RETRY_BACKOFF_MAX)
+        return self._cap(random.uniform(0, backoff))
     
-    for year in years:
-        year_df = df_filtered[df_filtered['year'] == year]
-        
-        # Get values for each vector
-        def get_val(vector_key):
-            vec = INFRA_VECTORS.get(vector_key)
-            row = year_df[year_df['VECTOR'] == vec]
-            return row['VALUE'].sum() if not row.empty else 0
-        
-        # Get raw values
-        fuel_energy = get_val('fuel_and_energy')
-        transport_raw = get_val('transport')
-        pipeline_transport = get_val('pipeline_transport')
-        health = get_val('health')
-        housing = get_val('housing')
-        education = get_val('education')
-        public_order = get_val('public_order')
-        transit = get_val('transit')
-        environmental = get_val('environmental')
-        communication = get_val('communication')
-        recreation = get_val('recreation')
-        
-        # Calculate combined categories per NRCAN Factbook
-        fuel_energy_pipelines = fuel_energy + pipeline_transport
-        transport = transport_raw - pipeline_transport  # Transport less pipelines
-        health_housing = health + housing
-        public_safety = public_order + transit + communication + recreation
-        
-        total = fuel_energy_pipelines + transport + health_housing + education + public_safety + environmental
-        
-        if total > 0:
-            year_int = int(year)
-            data_rows.extend([
-                ('page25_fuel_energy_pipelines', year_int, round(fuel_energy_pipelines, 1)),
-                ('page25_transport', year_int, round(transport, 1)),
-                ('page25_health_housing', year_int, round(health_housing, 1)),
-                ('page25_education', year_int, round(education, 1)),
-                ('page25_public_safety', year_int, round(public_safety, 1)),
-                ('page25_environmental', year_int, round(environmental, 1)),
-                ('page25_total', year_int, round(total, 1)),
-            ])
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else self._cap(min(retry_after, RETRY_AFTER_MAX))
     
-    # Metadata
-    metadata_rows = [
-        ('page25_fuel_energy_pipelines', 'Infrastructure - Fuel, energy and pipelines', 'Millions of dollars', 'millions'),
-        ('page25_transport', 'Infrastructure - Transport (less pipelines)', 'Millions of dollars', 'millions'),
-        ('page25_health_housing', 'Infrastructure - Health and housing', 'Millions of dollars', 'millions'),
-        ('page25_education', 'Infrastructure - Education', 'Millions of dollars', 'millions'),
-        ('page25_public_safety', 'Infrastructure - Public safety and other', 'Millions of dollars', 'millions'),
-        ('page25_environmental', 'Infrastructure - Environmental protection', 'Millions of dollars', 'millions'),
-        ('page25_total', 'Infrastructure - Total net stock', 'Millions of dollars', 'millions'),
-    ]
+    def is_exhausted(self):
+        return super().is_exhausted() or (self.deadline is not None and self.deadline.remaining() <= 0)
     
-    print(f"  Page 25: {len(data_rows)} data rows")
-    return data_rows, metadata_rows
+    def sleep(self, response=None):
+        super().sleep(response)
+        if self.deadline is not None:
+            self.deadline.check()
+
+
+def _new_session(deadline=None):
+    retry = JitteredRetry(
+        total=HTTP_RETRIES,
+        # A read timeout is retried once: a hung endpoint costs at most two timeouts
+        read=1,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        # getCubeMetadata is a read-only POST
+        allowed_methods=frozenset({"GET", "HEAD", "POST"}),
+        raise_on_status=False,
+        deadline=deadline,
+    )
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE,
+                          max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    return session
+
+
+def get_session(deadline=None):
+    """Return the shared pooled requests.Session, creating it on first use.
+    
+    With a deadline, return the session of that deadline instead: its
+    retries never wait past it (see JitteredRetry). It is created on first
+    use and shared by every request bounded by the same deadline.
+    """
+    global _session
+    with _session_lock:
+        if deadline is not None:
+            if deadline.session is None:
+                deadline.session = _new_session(deadline)
+            return deadline.session
+        if _session is None:
+            _session = _new_session()
+        return _session
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a refresh runs past its total time budget."""
+
+
+class Deadline:
+    """Total time budget shared by every request of one refresh."""
+    
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self._expires_at = time.monotonic() + seconds
+        # Pooled session of the requests bounded by this deadline (see get_session)
+        self.session = None
+    
+    def remaining(self):
+        return self._expires_at - time.monotonic()
+    
+    def check(self):
+        """Raise DeadlineExceeded once the budget is spent."""
+        if self.remaining() <= 0:
+            raise DeadlineExceeded(f"Refresh deadline of {self.seconds}s exceeded")
+    
+    def timeout(self, timeout):
+        """A per-request timeout that does not run past the deadline."""
+        self.check()
+        return min(timeout, self.remaining())
+
+
+def request_timeout(timeout, deadline=None):
+    """The timeout for one request, bounded by deadline when given."""
+    return timeout if deadline is None else deadline.timeout(timeout)
 
 
 # =============================================================================
-# PAGE 27: INVESTMENT BY ASSET TYPE (Fuel, Energy and Pipeline Infrastructure)
+# RUN METRICS
 # =============================================================================
+# A RunMetrics collects timings and sizes for one refresh: per table (HTTP
+# latency, bytes transferred, rows parsed), per aggregation pass (rows before
+# and after filtering), per page and per stage. refresh_all_data() writes them
+# to statcan_data/run_report.json and appends them to run_history.jsonl.
 
-def get_investment_by_asset_url():
-    """Get investment by asset type URL (Table 36-10-0608-01) with detailed asset breakdown."""
-    # This URL fetches investment data with detailed asset type breakdown
-    # Asset indices: 40=Wind/Solar, 41=Steam, 42=Nuclear, 43=Hydraulic, 44=Other electric, 
-    # 45=Transmission lines, 46=Distribution lines, 48=Pipelines, 57=Transformers
-    return "https://www150.statcan.gc.ca/t1/tbl1/en/dtl!downloadDbLoadingData.action?pid=3610060801&latestN=0&startDate=20070101&endDate=20301231&csvLocale=en&selectedMembers=%5B%5B%5D%2C%5B1%5D%2C%5B2%5D%2C%5B%5D%2C%5B40%2C41%2C42%2C43%2C44%2C45%2C46%2C48%2C57%5D%2C%5B%5D%5D&checkedLevels=0D1%2C3D1%2C5D1"
+class RunMetrics:
+    """Thread-safe collector of per-table, per-pass, per-page and per-stage metrics."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self._start = time.perf_counter()
+        self.tables = {}
+        self.passes = []
+        self.pages = {}
+        self.stages = {}
+    
+    def record_table(self, url, **values):
+        """Add or update the metrics of one downloaded table."""
+        with self._lock:
+            entry = self.tables.setdefault(url, {'url': url, 'pid': parse_member_selection(url)[0]})
+            entry.update(values)
+    
+    def record_pass(self, **values):
+        with self._lock:
+            self.passes.append(values)
+    
+    def record_page(self, page, **values):
+        with self._lock:
+            self.pages.setdefault(page, {'page': page}).update(values)
+    
+    @contextmanager
+    def stage(self, name):
+        """Time a block of work as a named stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.stages[name] = round(self.stages.get(name, 0) + time.perf_counter() - start, 4)
+    
+    def report(self, **extra):
+        """Return the run report as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                'started_at': self.started_at,
+                'finished_at': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                'wall_s': round(time.perf_counter() - self._start, 4),
+                **extra,
+                'stages': dict(self.stages),
+                'tables': list(self.tables.values()),
+                'passes': list(self.passes),
+                'pages': list(self.pages.values()),
+            }
 
 
-def process_page27_data():
-    """
-    Fetch investment by asset type data from StatCan and process for Page 27.
-    This breaks down fuel, energy and pipeline infrastructure by specific asset types.
-    
-    Returns list of tuples for data.csv and metadata.csv
+def stage(metrics, name):
+    """metrics.stage(name), or a no-op when no metrics are being collected."""
+    return nullcontext() if metrics is None else metrics.stage(name)
+
+
+def write_run_report(report, data_dir=None):
+    """Write run_report.json atomically and append the report to run_history.jsonl."""
+    data_dir = data_dir or get_data_dir()
+    path = os.path.join(data_dir, "run_report.json")
+    write_json_atomic(path, report)
+    with open(os.path.join(data_dir, "run_history.jsonl"), "a", encoding="utf-8") as f:
+        f.write(json.dumps(report, separators=(',', ':')) + "\n")
+    return path
+
+
+# =============================================================================
+# RAW RESPONSE CACHE
+# =============================================================================
+# Raw StatCan CSV bodies are kept under statcan_data/cache/ together with their
+# ETag, Last-Modified and SHA-256. Later runs revalidate them with conditional
+# requests, so an unchanged table costs a 304 instead of a full download.
+#
+# Cache modes:
+# - "revalidate": use the cache, revalidating every entry with StatCan (default)
+# - "offline":    replay cached bodies only and never touch the network
+# - "off":        always download and never read or write the cache
+
+CACHE_MODES = ("revalidate", "offline", "off")
+
+# Read size used when streaming response bodies into the CSV parser
+STREAM_CHUNK_SIZE = 256 * 1024
+
+
+def get_cache_dir():
+    """Ensure the raw response cache directory exists and return its path."""
+    cache_dir = os.path.join(get_data_dir(), "cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def get_cache_paths(url):
+    """Get paths to the cached body and its metadata file for a URL."""
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()[:20]
+    cache_dir = get_cache_dir()
+    return (
+        os.path.join(cache_dir, f"{key}.csv"),
+        os.path.join(cache_dir, f"{key}.json")
+    )
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Hash a file in chunks without reading it into memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_cache_metadata(url):
+    """Return the cache metadata for a URL, or None if it has no valid cached body."""
+    body_path, meta_path = get_cache_paths(url)
+    if not (os.path.exists(body_path) and os.path.exists(meta_path)):
+        return None
+    with open(meta_path, encoding="utf-8") as f:
+        metadata = json.load(f)
+    if file_sha256(body_path) != metadata.get("sha256"):
+        print("  Cached copy is corrupt, ignoring it")
+        return None
+    return metadata
+
+
+def store_cache_metadata(url, metadata):
+    """Write the metadata file for a cached URL atomically."""
+    _, meta_path = get_cache_paths(url)
+    write_json_atomic(meta_path, metadata)
+
+
+def conditional_headers(metadata):
+    """If-None-Match / If-Modified-Since headers revalidating a cached response's metadata."""
+    headers = {}
+    if metadata:
+        if metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
+    return headers
+
+
+class CachingResponseReader(io.RawIOBase):
+    """Binary stream over a streamed HTTP response.
+    
+    The body is decoded chunk by chunk as the CSV parser pulls it. When a cache
+    path is given every chunk is also copied to a temporary file that replaces
+    the cached body (with fresh metadata) once the stream is fully read.
+    on_close, if given, is called with the decoded and on-the-wire byte counts
+    when the stream is closed. A deadline stops a body that trickles in past it.
+    
+    Decoded bytes that do not fit the caller's buffer are kept for the next
+    read: urllib3 before 2.0 can return more than the requested size from a
+    compressed response.
     """
-    print("Processing Page 27: Investment by Asset Type...")
-    
-    df = fetch_csv_from_url(get_investment_by_asset_url())
-    
-    # Get the asset column name
-    asset_col = 'Asset'
     
-    # Filter data and convert year
-    df['year'] = pd.to_numeric(df['REF_DATE'], errors='coerce')
-    
-    # Filter for years 2009 onwards
-    df = df[df['year'] >= 2009].copy()
+    def __init__(self, response, url=None, metadata=None, on_close=None, deadline=None):
+        super().__init__()
+        self._response = response
+        self._pending = b""
+        self._on_close = on_close
+        self._deadline = deadline
+        self._url = url
+        self._metadata = metadata
+        self._digest = hashlib.sha256()
+        self._bytes = 0
+        self._file = None
+        if url is not None:
+            body_path, _ = get_cache_paths(url)
+            self._tmp_path = f"{body_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            self._file = open(self._tmp_path, "wb")
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        if not self._pending:
+            if self._deadline is not None:
+                self._deadline.check()
+            data = self._response.raw.read(len(buffer), decode_content=True)
+            if not data:
+                self._finish()
+                return 0
+            self._digest.update(data)
+            self._bytes += len(data)
+            if self._file is not None:
+                self._file.write(data)
+            self._pending = data
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+    
+    def _finish(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        sha256 = self._digest.hexdigest()
+        previous = load_cache_metadata(self._url)
+        if previous and previous.get("sha256") == sha256:
+            print("  Downloaded body is unchanged")
+        body_path, _ = get_cache_paths(self._url)
+        os.replace(self._tmp_path, body_path)
+        store_cache_metadata(self._url, dict(self._metadata, sha256=sha256, bytes=self._bytes))
+    
+    def close(self):
+        if self._file is not None:
+            # Stream abandoned before the end: never cache a partial body
+            self._file.close()
+            self._file = None
+            os.remove(self._tmp_path)
+        if self._on_close is not None:
+            on_close, self._on_close = self._on_close, None
+            on_close(self._bytes, self._response.raw.tell())
+        self._response.close()
+        super().close()
+
+
+def open_csv_stream(url, timeout=120, cache_mode="revalidate", metrics=None, deadline=None):
+    """Open the raw CSV body for a URL as a binary stream, using the on-disk cache.
     
-    years = sorted(df['year'].dropna().unique())
-    data_rows = []
+    Returns (stream, encoding). The caller must close the stream. With metrics,
+    the response status, HTTP latency and bytes transferred are recorded. The
+    request goes through the shared session (see get_session) and is bounded
+    by deadline when given.
+    """
+    if cache_mode not in CACHE_MODES:
+        raise ValueError(f"Unknown cache mode {cache_mode!r}, expected one of {CACHE_MODES}")
+    
+    cached_meta = None if cache_mode == "off" else load_cache_metadata(url)
+    body_path, _ = get_cache_paths(url)
+    
+    if cache_mode == "offline":
+        if cached_meta is None:
+            raise FileNotFoundError(f"Offline mode: no cached response for {url}")
+        print("  Offline: using cached copy")
+        if metrics is not None:
+            metrics.record_table(url, source="offline", bytes_transferred=0,
+                                 bytes_decoded=cached_meta.get("bytes"))
+        return open(body_path, "rb"), cached_meta["encoding"]
+    
+    headers = conditional_headers(cached_meta)
+    
+    request_start = time.perf_counter()
+    try:
+        response = get_session(deadline).get(url, timeout=request_timeout(timeout, deadline), headers=headers,
+                                     stream=True)
+    except requests.RequestException:
+        if deadline is not None:
+            deadline.check()
+        raise
+    now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    if metrics is not None:
+        retries = getattr(response.raw, "retries", None)
+        metrics.record_table(url, http_status=response.status_code,
+                             latency_s=round(time.perf_counter() - request_start, 4),
+                             retries=len(retries.history) if retries is not None else 0)
+    
+    if response.status_code == 304 and cached_meta is not None:
+        response.close()
+        print("  Not modified, using cached copy")
+        if metrics is not None:
+            metrics.record_table(url, source="not_modified", bytes_transferred=0,
+                                 bytes_decoded=cached_meta.get("bytes"))
+        store_cache_metadata(url, dict(cached_meta, validated_at=now))
+        return open(body_path, "rb"), cached_meta["encoding"]
+    
+    try:
+        response.raise_for_status()
+    except requests.HTTPError:
+        response.close()
+        raise
+    encoding = response.encoding or "utf-8"
+    on_close = None
+    if metrics is not None:
+        on_close = lambda decoded, wire: metrics.record_table(
+            url, source="downloaded", bytes_transferred=wire, bytes_decoded=decoded)
+    if cache_mode == "off":
+        reader = CachingResponseReader(response, on_close=on_close, deadline=deadline)
+    else:
+        reader = CachingResponseReader(response, url, {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "encoding": encoding,
+            "fetched_at": now,
+            "validated_at": now,
+        }, on_close=on_close, deadline=deadline)
+    return io.BufferedReader(reader, buffer_size=STREAM_CHUNK_SIZE), encoding
+
+
+def csv_read_options(columns=None):
+    """pd.read_csv keyword arguments that parse only the given columns.
     
-    # Exact asset names from StatCan Table 36-10-0608-01
-    # Based on the actual data structure
-    asset_exact_names = {
-        'wind_solar': 'Wind and solar power plants',
-        'steam_thermal': 'Steam production plants',
-        'nuclear': 'Nuclear production plants',
-        'hydraulic': 'Hydraulic production plants',
-        'other_electric': 'Other electric power construction',
-        'transmission_networks': 'Power transmission networks',
-        'distribution_networks': 'Power distribution networks',
-        'pipelines': 'Pipelines',
-        'transformers': 'Power and distribution transformers',
+    VALUE is read as float64; every other column (REF_DATE, VECTOR and the
+    dimension labels) repeats a few distinct strings and is read as category.
+    Columns missing from the table are ignored rather than raising, so the
+    passes can report them. columns=None parses every column as before.
+    """
+    if columns is None:
+        return {}
+    wanted = set(columns)
+    return {
+        'usecols': lambda column: column in wanted,
+        'dtype': {column: 'float64' if column == 'VALUE' else 'category' for column in wanted},
     }
+
+
+def fetch_csv_from_url(url, timeout=120, cache_mode="revalidate", chunksize=None, metrics=None,
+                       deadline=None, columns=None):
+    """Fetch CSV data from a URL and return as DataFrame.
+    
+    The response is streamed straight into the CSV parser instead of being
+    held in memory as text. With chunksize, an iterator of DataFrames of at
+    most that many rows is returned instead of one DataFrame. With columns,
+    only those columns are parsed (see csv_read_options). With metrics, the
+    download and the number of rows parsed are recorded; for chunks, once the
+    iterator is exhausted or closed.
+    """
+    print("Fetching data from StatCan...")
+    fetch_start = time.perf_counter()
+    stream, encoding = open_csv_stream(url, timeout=timeout, cache_mode=cache_mode, metrics=metrics,
+                                       deadline=deadline)
+    options = csv_read_options(columns)
+    if chunksize is not None:
+        return _read_csv_chunks(stream, encoding, chunksize, options, metrics, url, fetch_start)
+    with stream:
+        df = pd.read_csv(stream, encoding=encoding, encoding_errors="replace", **options)
+    if metrics is not None:
+        metrics.record_table(url, rows_parsed=len(df), fetch_s=round(time.perf_counter() - fetch_start, 4),
+                             columns_parsed=len(df.columns),
+                             frame_bytes=int(df.memory_usage(index=False, deep=True).sum()))
+    return df
+
+
+def _read_csv_chunks(stream, encoding, chunksize, options=None, metrics=None, url=None, fetch_start=None):
+    rows = frame_bytes = 0
+    columns = None
+    try:
+        with stream, pd.read_csv(stream, encoding=encoding, encoding_errors="replace",
+                                 chunksize=chunksize, **(options or {})) as reader:
+            for chunk in reader:
+                rows += len(chunk)
+                frame_bytes += int(chunk.memory_usage(index=False, deep=True).sum())
+                columns = len(chunk.columns)
+                yield chunk
+    finally:
+        if metrics is not None:
+            metrics.record_table(url, rows_parsed=rows, fetch_s=round(time.perf_counter() - fetch_start, 4),
+                                 columns_parsed=columns, frame_bytes=frame_bytes)
+
+
+def fetch_csv_from_url_buffered(url, timeout=120):
+    """Fetch CSV data the pre-streaming way: whole body as text, then parse.
     
-    for year in years:
-        year_df = df[df['year'] == year]
-        year_int = int(year)
-        
-        values = {}
-        for key, exact_name in asset_exact_names.items():
-            mask = year_df[asset_col] == exact_name
-            values[key] = year_df.loc[mask, 'VALUE'].sum()
-        
-        # Combine transmission networks + distribution networks + transformers into one category
-        transmission_distribution = values.get('transmission_networks', 0) + values.get('distribution_networks', 0) + values.get('transformers', 0)
-        
-        # Calculate total
-        total = (transmission_distribution + values.get('pipelines', 0) + values.get('nuclear', 0) + 
-                 values.get('other_electric', 0) + values.get('hydraulic', 0) + 
-                 values.get('wind_solar', 0) + values.get('steam_thermal', 0))
-        
-        if total > 0:
-            data_rows.extend([
-                ('page27_transmission_distribution', year_int, round(transmission_distribution, 1)),
-                ('page27_pipelines', year_int, round(values.get('pipelines', 0), 1)),
-                ('page27_nuclear', year_int, round(values.get('nuclear', 0), 1)),
-                ('page27_other_electric', year_int, round(values.get('other_electric', 0), 1)),
-                ('page27_hydraulic', year_int, round(values.get('hydraulic', 0), 1)),
-                ('page27_wind_solar', year_int, round(values.get('wind_solar', 0), 1)),
-                ('page27_steam_thermal', year_int, round(values.get('steam_thermal', 0), 1)),
-                ('page27_total', year_int, round(total, 1)),
-            ])
-    
-    # Metadata
-    metadata_rows = [
-        ('page27_transmission_distribution', 'Investment - Transmission, distribution and transformers', 'Millions of dollars', 'millions'),
-        ('page27_pipelines', 'Investment - Pipelines', 'Millions of dollars', 'millions'),
-        ('page27_nuclear', 'Investment - Nuclear production plants', 'Millions of dollars', 'millions'),
-        ('page27_other_electric', 'Investment - Other electric power construction', 'Millions of dollars', 'millions'),
-        ('page27_hydraulic', 'Investment - Hydraulic production plants', 'Millions of dollars', 'millions'),
-        ('page27_wind_solar', 'Investment - Wind and solar power plants', 'Millions of dollars', 'millions'),
-        ('page27_steam_thermal', 'Investment - Steam production plants', 'Millions of dollars', 'millions'),
-        ('page27_total', 'Investment - Total fuel, energy and pipeline', 'Millions of dollars', 'millions'),
-    ]
-    
-    print(f"  Page 27: {len(data_rows)} data rows")
-    return data_rows, metadata_rows
+    Kept as the reference path for measure_fetch_memory().
+    """
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    return pd.read_csv(io.StringIO(response.text))
+
+
+def _proc_status_bytes(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1]) * 1024
+    raise OSError(f"No {field} in /proc/self/status")
+
+
+def _measure_fetch_path(name, url, timeout):
+    """Run one fetch path in this (fresh) process; returns (rows, peak RSS growth in bytes)."""
+    if name == "buffered":
+        fetch = fetch_csv_from_url_buffered
+    else:
+        fetch = partial(fetch_csv_from_url, cache_mode="off")
+    try:
+        # Linux: restart the VmHWM high-water mark from the current RSS, so
+        # the peak of the imports does not hide a smaller fetch
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        before = _proc_status_bytes("VmRSS")
+        peak = partial(_proc_status_bytes, "VmHWM")
+    except OSError:
+        # Elsewhere only the peak since process start is known: growth over it is a lower bound
+        unit = 1 if sys.platform == "darwin" else 1024  # ru_maxrss: bytes on macOS, kilobytes on Linux
+        peak = lambda: resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+        before = peak()
+    df = fetch(url, timeout=timeout)
+    return len(df), peak() - before
+
+
+def measure_fetch_memory(url, timeout=120):
+    """Compare the peak memory of the buffered and streaming fetch paths.
+    
+    Both paths download the URL with the cache disabled, each in a fresh
+    process, and are measured by how far they raise its peak RSS. Unlike
+    tracemalloc, this includes the buffers of pandas' C parser. Outside Linux
+    the peak cannot be reset after the imports, so growth below their peak
+    goes unseen and the result is a lower bound. Returns a dict
+    with the peak growth in bytes of each path and the reduction as a
+    fraction of the buffered peak. Needs the resource module (not on Windows).
+    """
+    if resource is None:
+        raise RuntimeError("measure_fetch_memory() needs the resource module, which Windows lacks")
+    peaks = {}
+    context = multiprocessing.get_context("spawn")
+    for name in ("buffered", "streaming"):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            peaks["rows"], peaks[name] = executor.submit(_measure_fetch_path, name, url, timeout).result()
+    peaks["reduction"] = 1 - peaks["streaming"] / peaks["buffered"]
+    return peaks
 
 
 # =============================================================================
-# PAGE 26: ECONOMIC CONTRIBUTIONS
+# SHARED TABLE CACHE
 # =============================================================================
+# Several pages read the same StatCan table (e.g. Table 34-10-0036-01 is used by
+# Page 24 and Page 26). A TableCache lives for one refresh and makes sure every
+# URL is downloaded and parsed once, even when pages run concurrently. Queries
+# of one table with different member selections (Table 36-10-0608-01 for Page
+# 25 and Page 27) are still separate downloads; --source full-table downloads
+# such a table once and cuts every selection out of it (see FULL-TABLE SOURCE).
 
-def process_page26_data():
-    """
-    Fetch economic contributions data from StatCan and process for Page 26.
+def parse_member_selection(url):
+    """Split a StatCan download URL into its table id and member selection.
     
-    Returns list of tuples for data.csv and metadata.csv
+    Returns (pid, other_params, selection) where selection is a list with one
+    (explicit_member_ids, checked_levels) pair of frozensets per dimension.
     """
-    print("Processing Page 26: Economic Contributions...")
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)
+    members = json.loads(query.pop('selectedMembers', ['[]'])[0])
+    levels = {}
+    for item in filter(None, query.pop('checkedLevels', [''])[0].split(',')):
+        dim, depth = item.split('D')
+        levels.setdefault(int(dim), set()).add(int(depth))
+    selection = [(frozenset(ids), frozenset(levels.get(dim, ()))) for dim, ids in enumerate(members)]
+    pid = query.get('pid', [''])[0]
+    other_params = tuple(sorted((key, values[0]) for key, values in query.items()))
+    return pid, other_params, selection
+
+
+def run_once(futures, lock, key, load):
+    """Return load() for key, calling it at most once however many threads ask.
     
-    # Fetch economic contributions data
-    df_econ = fetch_csv_from_url(get_economic_contributions_url())
+    futures maps each key to the Future of its first call, under lock;
+    concurrent and later calls wait on it and share its result or error.
+    """
+    with lock:
+        future = futures.get(key)
+        owner = future is None
+        if owner:
+            future = futures[key] = Future()
+    if not owner:
+        return future.result()
+    try:
+        result = load()
+    except BaseException as error:
+        future.set_exception(error)
+        raise
+    future.set_result(result)
+    return result
+
+
+class TableCache:
+    """Refresh-scoped cache of parsed StatCan tables, keyed by URL and parsed columns.
     
-    # Filter for our vectors
-    all_vectors = list(ECON_VECTORS.values())
-    df_filtered = df_econ[df_econ['VECTOR'].isin(all_vectors)].copy()
-    df_filtered['year'] = pd.to_numeric(df_filtered['REF_DATE'], errors='coerce')
+    Concurrent requests for the same URL wait on a single download.
     
-    # Also fetch capital expenditures for investment values
-    df_capex = fetch_csv_from_url(get_capital_expenditures_url())
-    df_capex = df_capex[df_capex['Capital and repair expenditures'] == 'Capital expenditures'].copy()
-    df_capex['year'] = pd.to_numeric(df_capex['REF_DATE'], errors='coerce')
-    naics_col = 'North American Industry Classification System (NAICS)'
+    Cached DataFrames are shared between pages and must not be modified.
+    """
     
-    years = sorted(df_filtered['year'].dropna().unique())
-    data_rows = []
+    def __init__(self, fetch=None):
+        self._fetch = fetch or fetch_source
+        self._lock = threading.Lock()
+        self._tables = {}
+        self.fetch_count = 0
     
-    for year in years:
-        year_df = df_filtered[df_filtered['year'] == year]
-        
-        # Get values for each vector
-        def get_val(vector_key):
-            vec = ECON_VECTORS.get(vector_key)
-            row = year_df[year_df['VECTOR'] == vec]
-            return row['VALUE'].iloc[0] if not row.empty and pd.notna(row['VALUE'].iloc[0]) else 0
-        
-        # Jobs: Direct + Indirect (in thousands from StatCan, convert to actual)
-        jobs_direct = get_val('jobs_direct')
-        jobs_indirect = get_val('jobs_indirect')
-        jobs = (jobs_direct + jobs_indirect) * 1000  # Convert thousands to actual
-        
-        # Employment income: Direct + Indirect (in millions)
-        income_direct = get_val('income_direct')
-        income_indirect = get_val('income_indirect')
-        employment_income = income_direct + income_indirect
+    def get(self, url, columns=None):
+        """Return the parsed table for url, downloading it at most once.
         
-        # GDP: Direct + Indirect (in millions)
-        gdp_direct = get_val('gdp_direct')
-        gdp_indirect = get_val('gdp_indirect')
-        gdp = gdp_direct + gdp_indirect
-        
-        # Investment value: Sum of fuel/energy/pipeline related capital expenditures
-        year_capex = df_capex[df_capex['year'] == year]
-        investment_mask = year_capex[naics_col].str.contains(
-            r'\[211\]|\[2211\]|\[2212\]|\[486\]|\[324\]', regex=True, na=False
-        )
-        investment_value = year_capex.loc[investment_mask, 'VALUE'].sum()
-        
-        if any([jobs, employment_income, gdp]):
-            year_int = int(year)
-            data_rows.extend([
-                ('page26_jobs', year_int, round(jobs, 0)),
-                ('page26_employment_income', year_int, round(employment_income, 1)),
-                ('page26_gdp', year_int, round(gdp, 1)),
-                ('page26_investment_value', year_int, round(investment_value, 1)),
-            ])
-    
-    # Metadata
-    metadata_rows = [
-        ('page26_jobs', 'Economic contributions - Jobs (direct + indirect)', 'Number', 'units'),
-        ('page26_employment_income', 'Economic contributions - Employment income', 'Millions of dollars', 'millions'),
-        ('page26_gdp', 'Economic contributions - GDP', 'Millions of dollars', 'millions'),
-        ('page26_investment_value', 'Annual investment - Fuel, energy and pipelines', 'Millions of dollars', 'millions'),
-    ]
-    
-    print(f"  Page 26: {len(data_rows)} data rows")
-    return data_rows, metadata_rows
+        With columns, only those columns are parsed (see csv_read_options).
+        """
+        key = url if columns is None else (url, frozenset(columns))
+        return run_once(self._tables, self._lock, key, partial(self._load, url, columns))
+    
+    def _load(self, url, columns=None):
+        with self._lock:
+            self.fetch_count += 1
+        return self._fetch(url) if columns is None else self._fetch(url, columns=columns)
 
 
 # =============================================================================
-# PAGE 31: INTERNATIONAL INVESTMENTS (FDI and CDIA)
+# FULL-TABLE SOURCE
 # =============================================================================
+# Instead of one member-selection query per page source, the full-table source
+# downloads each StatCan table once as its full-table CSV zip (for example
+# /n1/tbl/csv/36100608-eng.zip) and keeps it under statcan_data/tables/. With
+# pyarrow installed the table is extracted to a Feather (Arrow IPC) file that is
+# memory-mapped on every read, so only the rows a query selects are
+# materialized; without pyarrow the extracted CSV is scanned in chunks.
+#
+# Query URLs keep working unchanged: each one is answered by applying its member
+# selection (COORDINATE member ids, plus the hierarchy levels listed in the
+# table's _MetaData.csv) and its date range to the full table.
 
-def process_page31_data():
-    """
-    Fetch international investment data from StatCan and process for Page 31.
-    
-    FDI = Foreign Direct Investment in Canada
-    CDIA = Canadian Direct Investment Abroad
-    
-    Energy industries include:
-    - Mining and oil and gas extraction [21]
-    - Utilities [22]
-    - Pipeline transportation [486]
-    - Petroleum and coal products manufacturing [324]
+# Where the refresher gets its tables: one query per source, or full tables
+SOURCES = ("query", "full-table")
+
+# Rows per chunk when scanning an extracted CSV (no pyarrow)
+FULL_TABLE_CHUNK_ROWS = 200_000
+
+
+def has_pyarrow():
+    """Whether the optional pyarrow package (Feather full-table store) is installed."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def full_table_url(pid):
+    """Download URL of the full-table CSV zip of an 8-digit table id."""
+    return f"{STATCAN_HOST}/n1/tbl/csv/{pid}-eng.zip"
+
+
+def get_table_store_paths(pid):
+    """Get paths to the extracted full table and its metadata file."""
+    store_dir = os.path.join(get_data_dir(), "tables")
+    os.makedirs(store_dir, exist_ok=True)
+    extension = "feather" if has_pyarrow() else "csv"
+    return (
+        os.path.join(store_dir, f"{pid}.{extension}"),
+        os.path.join(store_dir, f"{pid}.json")
+    )
+
+
+def parse_member_hierarchy(metadata_text):
+    """Depth of every dimension member from a table's _MetaData.csv.
     
-    Returns list of tuples for data.csv and metadata.csv
+    Returns {dimension_index: {member_id: depth}} with 0-based dimension
+    indexes (as in selectedMembers) and depth 1 for members without a parent.
     """
-    print("Processing Page 31: International Investments...")
-    
-    df = fetch_csv_from_url(get_international_investment_url())
-    
-    print(f"  Total rows fetched: {len(df)}")
-    print(f"  Columns: {df.columns.tolist()}")
+    parents = {}
+    columns = None
+    for row in csv.reader(io.StringIO(metadata_text)):
+        if columns is None:
+            if {'Dimension ID', 'Member ID', 'Parent Member ID'} <= set(row):
+                columns = {name: index for index, name in enumerate(row)}
+            continue
+        if not any(row) or len(row) < len(columns):
+            break
+        dim = int(row[columns['Dimension ID']]) - 1
+        parent = row[columns['Parent Member ID']]
+        parents.setdefault(dim, {})[int(row[columns['Member ID']])] = int(parent) if parent else None
+    
+    def depth(dim, member):
+        parent = parents[dim].get(member)
+        return 1 if parent is None or parent not in parents[dim] else depth(dim, parent) + 1
+    
+    return {dim: {member: depth(dim, member) for member in members} for dim, members in parents.items()}
+
+
+def selection_filter(url, hierarchy):
+    """Predicates that cut the rows of a query URL out of its full table.
     
-    # Column names
-    naics_col = 'North American Industry Classification System (NAICS)'
-    investment_col = 'Canadian and foreign direct investment'
+    Returns (keep_coordinate, keep_ref_date). A dimension keeps its explicitly
+    selected members plus every member at a checked hierarchy level; a
+    dimension with neither keeps all members. REF_DATE must fall within the
+    URL's startDate and endDate.
+    """
+    _, params, selection = parse_member_selection(url)
+    params = dict(params)
+    allowed = {}
+    for dim, (ids, levels) in enumerate(selection):
+        if ids or levels:
+            allowed[dim] = set(ids) | {member for member, depth in hierarchy.get(dim, {}).items()
+                                       if depth in levels}
+    
+    def keep_coordinate(coordinate):
+        members = coordinate.split('.')
+        return all(dim < len(members) and members[dim].isdigit() and int(members[dim]) in ids
+                   for dim, ids in allowed.items())
+    
+    def iso(date):
+        return f"{date[:4]}-{date[4:6]}-{date[6:8]}" if date else None
+    start, end = iso(params.get('startDate')), iso(params.get('endDate'))
+    
+    def keep_ref_date(ref_date):
+        return ((start is None or ref_date >= start[:len(ref_date)]) and
+                (end is None or ref_date <= end[:len(ref_date)]))
+    
+    return keep_coordinate, keep_ref_date
+
+
+def _kept_values(values, keep):
+    # The predicates run once per distinct value, not once per row
+    return [value for value in values if isinstance(value, str) and keep(value)]
+
+
+class FullTableSource:
+    """TableCache fetch backend answering query URLs from full-table downloads.
     
-    # Check if columns exist
-    if naics_col not in df.columns:
-        print(f"  WARNING: Column '{naics_col}' not found!")
-        print(f"  Available columns: {df.columns.tolist()}")
-        return [], []
+    Use in place of fetch_csv_from_url: TableCache(FullTableSource(...)).
+    Every table is downloaded (or revalidated, see CACHE_MODES) at most once
+    per instance, however many query URLs read it.
+    """
     
-    # Print unique industry names for debugging
-    unique_industries = df[naics_col].unique().tolist()
-    print(f"  Found {len(unique_industries)} unique industries:")
-    for ind in unique_industries:
-        print(f"    - {ind}")
-    
-    # Energy industries to sum for FDI/CDIA totals
-    # The URL returns child categories [211], [213] instead of parent [21]
-    energy_industries = [
-        'Oil and gas extraction [211]',
-        'Support activities for mining and oil and gas extraction [213]',
-        'Utilities [22]',
-        'Petroleum and coal products manufacturing [324]'
-    ]
-    
-    # Find which energy industries are in the data
-    found_industries = [ind for ind in unique_industries if ind in energy_industries]
-    for ind in found_industries:
-        print(f"    Using: {ind}")
-    
-    # Convert year
-    df['year'] = pd.to_numeric(df['REF_DATE'], errors='coerce')
-    
-    # Filter for years 2007 onwards (matching factbook chart)
-    df = df[df['year'] >= 2007].copy()
-    
-    years = sorted(df['year'].dropna().unique())
-    data_rows = []
-    
-    for year in years:
-        year_df = df[df['year'] == year]
-        year_int = int(year)
+    def __init__(self, timeout=600, cache_mode="revalidate", metrics=None, deadline=None):
+        if cache_mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode {cache_mode!r}, expected one of {CACHE_MODES}")
+        self.timeout = timeout
+        self.cache_mode = cache_mode
+        self.metrics = metrics
+        self.deadline = deadline
+        self._lock = threading.Lock()
+        self._tables = {}
+        self.download_count = 0
+    
+    def __call__(self, url, columns=None):
+        """Return the rows of a query URL as a DataFrame, like fetch_csv_from_url."""
+        pid = table_product_id(url)
+        data_path, hierarchy = self.table(pid)
+        print(f"Selecting rows from full table {pid}...")
+        fetch_start = time.perf_counter()
+        keep_coordinate, keep_ref_date = selection_filter(url, hierarchy)
+        read_columns = None if columns is None else sorted(set(columns) | {'COORDINATE', 'REF_DATE'})
+        if has_pyarrow():
+            df = self._select_feather(data_path, read_columns, keep_coordinate, keep_ref_date)
+        else:
+            df = self._select_csv(data_path, read_columns, keep_coordinate, keep_ref_date)
+        if columns is not None:
+            df = df[[column for column in df.columns if column in set(columns)]]
+            dtypes = csv_read_options(columns)['dtype']
+            df = df.astype({column: dtypes[column] for column in df.columns})
+        if self.metrics is not None:
+            self.metrics.record_table(url, source="full_table", rows_parsed=len(df),
+                                      fetch_s=round(time.perf_counter() - fetch_start, 4))
+        return df
+    
+    def table(self, pid):
+        """Return (data_path, hierarchy) of a full table, fetching it at most once."""
+        return run_once(self._tables, self._lock, pid, partial(self._fetch, pid))
+    
+    def _fetch(self, pid):
+        with self._lock:
+            self.download_count += 1
+        url = full_table_url(pid)
+        data_path, meta_path = get_table_store_paths(pid)
+        stored = None
+        if self.cache_mode != "off" and os.path.exists(data_path) and os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                stored = json.load(f)
         
-        # Filter for energy industries
-        year_energy = year_df[year_df[naics_col].isin(found_industries)]
+        if self.cache_mode == "offline":
+            if stored is None:
+                raise FileNotFoundError(f"Offline mode: no stored full table {pid}")
+            print(f"  Offline: using stored full table {pid}")
+            return data_path, _stored_hierarchy(stored)
         
-        # Sum CDIA for all energy industries
-        cdia_mask = year_energy[investment_col].str.contains('Canadian direct investment abroad', case=False, na=False)
-        cdia_total = year_energy.loc[cdia_mask, 'VALUE'].sum()
+        headers = conditional_headers(stored)
+        print(f"Downloading full table {pid} from StatCan...")
+        request_start = time.perf_counter()
+        try:
+            response = get_session(self.deadline).get(url, timeout=request_timeout(self.timeout, self.deadline),
+                                         headers=headers, stream=True)
+        except requests.RequestException:
+            if self.deadline is not None:
+                self.deadline.check()
+            raise
+        now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        if self.metrics is not None:
+            self.metrics.record_table(url, http_status=response.status_code,
+                                      latency_s=round(time.perf_counter() - request_start, 4))
         
-        # Sum FDI for all energy industries
-        fdi_mask = year_energy[investment_col].str.contains('Foreign direct investment in Canada', case=False, na=False)
-        fdi_total = year_energy.loc[fdi_mask, 'VALUE'].sum()
+        with response:
+            if response.status_code == 304 and stored is not None:
+                print("  Not modified, using stored full table")
+                if self.metrics is not None:
+                    self.metrics.record_table(url, source="not_modified", bytes_transferred=0)
+                stored["validated_at"] = now
+                write_json_atomic(meta_path, stored)
+                return data_path, _stored_hierarchy(stored)
+            response.raise_for_status()
+            zip_path = f"{data_path}.{os.getpid()}.{threading.get_ident()}.zip"
+            try:
+                with open(zip_path, "wb") as f:
+                    for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                        if self.deadline is not None:
+                            self.deadline.check()
+                        f.write(chunk)
+                extract_start = time.perf_counter()
+                hierarchy, rows = extract_full_table(zip_path, pid, data_path)
+            finally:
+                if os.path.exists(zip_path):
+                    os.remove(zip_path)
         
-        if cdia_total > 0 or fdi_total > 0:
-            # Values are in millions
-            data_rows.extend([
-                ('page31_cdia', year_int, round(cdia_total, 1)),
-                ('page31_fdi', year_int, round(fdi_total, 1)),
-            ])
-            # Debug print for first and last years
-            if year_int == 2007 or year_int == max(years):
-                print(f"    {year_int}: CDIA={cdia_total}M, FDI={fdi_total}M")
-    
-    # Metadata
-    metadata_rows = [
-        ('page31_cdia', 'Canadian direct investment abroad (CDIA) - Energy industry', 'Millions of dollars', 'millions'),
-        ('page31_fdi', 'Foreign direct investment in Canada (FDI) - Energy industry', 'Millions of dollars', 'millions'),
-    ]
+        if self.metrics is not None:
+            self.metrics.record_table(url, source="downloaded", bytes_transferred=response.raw.tell(),
+                                      rows_extracted=rows,
+                                      extract_s=round(time.perf_counter() - extract_start, 4))
+        write_json_atomic(meta_path, {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "rows": rows,
+            "hierarchy": {str(dim): {str(member): depth for member, depth in members.items()}
+                          for dim, members in hierarchy.items()},
+            "fetched_at": now,
+            "validated_at": now,
+        })
+        return data_path, hierarchy
+    
+    @staticmethod
+    def _select_feather(data_path, columns, keep_coordinate, keep_ref_date):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.ipc as pa_ipc
+        
+        # Memory-mapped: only the selected rows are copied out of the file
+        table = pa_ipc.open_file(pa.memory_map(data_path)).read_all()
+        if columns is not None:
+            table = table.select([column for column in columns if column in table.column_names])
+        mask = None
+        for column, keep in (('COORDINATE', keep_coordinate), ('REF_DATE', keep_ref_date)):
+            values = table.column(column)
+            kept = pa.array(_kept_values(pc.unique(values).to_pylist(), keep), pa.string())
+            column_mask = pc.is_in(values, value_set=kept)
+            mask = column_mask if mask is None else pc.and_(mask, column_mask)
+        return table.filter(mask).to_pandas()
+    
+    @staticmethod
+    def _select_csv(data_path, columns, keep_coordinate, keep_ref_date):
+        usecols = None if columns is None else (lambda column: column in set(columns))
+        parts = []
+        with pd.read_csv(data_path, usecols=usecols, dtype=str, chunksize=FULL_TABLE_CHUNK_ROWS,
+                         encoding_errors="replace") as reader:
+            for chunk in reader:
+                mask = (chunk['COORDINATE'].isin(_kept_values(chunk['COORDINATE'].unique(), keep_coordinate)) &
+                        chunk['REF_DATE'].isin(_kept_values(chunk['REF_DATE'].unique(), keep_ref_date)))
+                parts.append(chunk[mask])
+        df = pd.concat(parts, ignore_index=True)
+        if 'VALUE' in df.columns:
+            df['VALUE'] = pd.to_numeric(df['VALUE'], errors='coerce')
+        return df
+
+
+def _stored_hierarchy(stored):
+    return {int(dim): {int(member): depth for member, depth in members.items()}
+            for dim, members in stored.get("hierarchy", {}).items()}
+
+
+def extract_full_table(zip_path, pid, data_path):
+    """Extract <pid>.csv from a full-table zip to data_path, atomically.
     
-    print(f"  Page 31: {len(data_rows)} data rows")
-    return data_rows, metadata_rows
+    With pyarrow the CSV is converted batch by batch to a Feather (Arrow IPC)
+    file with VALUE as float64 and every other column as string; otherwise it
+    is copied out as CSV. Returns (hierarchy, rows) where hierarchy comes from
+    <pid>_MetaData.csv (see parse_member_hierarchy); rows is None for CSV.
+    """
+    tmp_path = f"{data_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    rows = None
+    with zipfile.ZipFile(zip_path) as archive:
+        hierarchy = parse_member_hierarchy(
+            archive.read(f"{pid}_MetaData.csv").decode("utf-8-sig", errors="replace"))
+        with archive.open(f"{pid}.csv") as f:
+            header = next(csv.reader([f.readline().decode("utf-8-sig")]))
+        with archive.open(f"{pid}.csv") as f, open(tmp_path, "wb") as out:
+            if not has_pyarrow():
+                while chunk := f.read(STREAM_CHUNK_SIZE):
+                    out.write(chunk)
+            else:
+                import pyarrow as pa
+                import pyarrow.csv as pa_csv
+                import pyarrow.ipc as pa_ipc
+                
+                reader = pa_csv.open_csv(
+                    f,
+                    read_options=pa_csv.ReadOptions(column_names=header, skip_rows=1),
+                    convert_options=pa_csv.ConvertOptions(
+                        column_types={column: pa.float64() if column == 'VALUE' else pa.string()
+                                      for column in header},
+                        strings_can_be_null=True,
+                    ),
+                )
+                rows = 0
+                with pa_ipc.new_file(out, reader.schema) as writer:
+                    for batch in reader:
+                        writer.write_batch(batch)
+                        rows += batch.num_rows
+    os.replace(tmp_path, data_path)
+    return hierarchy, rows
 
 
 # =============================================================================
-# PAGE 32: FOREIGN CONTROL OF CANADIAN ASSETS (Table 33-10-0570-01)
+# VECTOR SOURCE
 # =============================================================================
+# Some pages read a handful of StatCan series by vector id (INFRA_VECTORS,
+# ECON_VECTORS) out of a much larger cube slice. With compile_plan(vectors=True)
+# such a table is requested from the WDS getDataFromVectorByReferencePeriodRange
+# endpoint instead: one call for all of its vectors, returning only their data
+# points. fetch_vector_data() turns the JSON into the REF_DATE, VECTOR and VALUE
+# columns the passes read, so the page specs are unchanged.
 
-def get_environmental_protection_url():
-    """Get environmental protection expenditures URL (Table 38-10-0130-01).
-    
-    Returns data for:
-    - Oil and gas extraction [211]
-    - Electric power generation [2211]
-    - Petroleum and coal product manufacturing [324]
-    - Total industries
+# Characters of a StatCan REF_DATE per WDS frequencyCode (annual "2020",
+# quarterly and monthly "2020-01"); other frequencies keep the full date
+REF_DATE_LENGTHS = {12: 4, 9: 7, 6: 7}
+
+
+def wds_base_url():
+    """Base URL of StatCan's Web Data Service (STATCAN_WDS_URL overrides it)."""
+    return WDS_URL or f"{STATCAN_HOST}/t1/wds/rest"
+
+
+def source_vectors(source):
+    """Vector ids a page source reads, or None if it selects rows by anything else."""
+    if source.get('where'):
+        return None
+    ids = []
+    for matchers in source['series'].values():
+        vector = matchers.get('VECTOR')
+        if set(matchers) != {'VECTOR'} or not isinstance(vector, str):
+            return None
+        ids.append(vector)
+    return ids
+
+
+def vector_data_url(vectors, download_url):
+    """WDS request for the given vectors over the date range of a table download URL."""
+    params = urllib.parse.parse_qs(urllib.parse.urlsplit(download_url).query)
+    query = {'vectorIds': ','.join(f'"{vector.lstrip("v")}"' for vector in vectors)}
+    for name, param in (('startRefPeriod', 'startDate'), ('endReferencePeriod', 'endDate')):
+        date = params.get(param, [''])[0]
+        if date:
+            query[name] = f"{date[:4]}-{date[4:6]}-{date[6:8]}"
+    return (f"{wds_base_url()}/getDataFromVectorByReferencePeriodRange?" +
+            urllib.parse.urlencode(query, safe='",'))
+
+
+def is_vector_url(url):
+    return urllib.parse.urlsplit(url).path.endswith('/getDataFromVectorByReferencePeriodRange')
+
+
+def fetch_vector_data(url, timeout=120, cache_mode="revalidate", metrics=None, deadline=None, columns=None):
+    """Fetch a WDS vector request and return it as a REF_DATE, VECTOR, VALUE DataFrame.
     
-    Environmental activities:
-    - Total, environmental protection activities
-    - Solid waste management
-    - Wastewater management
-    - Air pollution management
-    - Protection and remediation of soil, groundwater and surface water
-    - Other environmental protection activities
+    The response goes through the same raw response cache as table downloads.
+    Raises ValueError if the service reports a failure for any vector.
     """
-    return "https://www150.statcan.gc.ca/t1/tbl1/en/dtl!downloadDbLoadingData.action?pid=3810013001&latestN=0&startDate=20070101&endDate=20301212&csvLocale=en&selectedMembers=%5B%5B%5D%2C%5B%5D%2C%5B3%2C5%2C6%2C11%5D%2C%5B12%2C13%2C14%2C15%5D%5D&checkedLevels=0D1%2C1D1%2C2D1%2C3D1%2C3D2"
+    print("Fetching vector data from StatCan...")
+    fetch_start = time.perf_counter()
+    stream, encoding = open_csv_stream(url, timeout=timeout, cache_mode=cache_mode, metrics=metrics,
+                                       deadline=deadline)
+    with stream:
+        payload = json.load(io.TextIOWrapper(stream, encoding=encoding))
+    rows = []
+    for item in payload:
+        series = item.get("object")
+        if item.get("status") != "SUCCESS" or not isinstance(series, dict):
+            raise ValueError(f"WDS vector request failed: {series}")
+        vector = f"v{series['vectorId']}"
+        for point in series.get("vectorDataPoint", []):
+            ref_date = point["refPer"][:REF_DATE_LENGTHS.get(point.get("frequencyCode"))]
+            rows.append((ref_date, vector, point.get("value")))
+    df = pd.DataFrame(rows, columns=['REF_DATE', 'VECTOR', 'VALUE'])
+    df['VALUE'] = pd.to_numeric(df['VALUE'], errors='coerce')
+    if columns is not None:
+        dtypes = csv_read_options(columns)['dtype']
+        df = df[[column for column in df.columns if column in dtypes]]
+        df = df.astype({column: dtypes[column] for column in df.columns})
+    if metrics is not None:
+        metrics.record_table(url, rows_parsed=len(df), fetch_s=round(time.perf_counter() - fetch_start, 4))
+    return df
 
-def get_foreign_control_url():
-    """Get foreign control URL (Table 33-10-0570-01).
+
+def fetch_source(url, columns=None, table_fetch=None, vector_fetch=None):
+    """Fetch a download URL with the backend for its kind: WDS vectors or a table.
     
-    Returns percentage of total assets under foreign control for:
-    - Total non-financial industries
-    - Oil and gas extraction and support activities [211, 213]
-    - Utilities [22]
+    table_fetch defaults to fetch_csv_from_url and vector_fetch to
+    fetch_vector_data.
     """
-    return "https://www150.statcan.gc.ca/t1/tbl1/en/dtl!downloadDbLoadingData.action?pid=3310057001&latestN=0&startDate=20100101&endDate=20301212&csvLocale=en&selectedMembers=%5B%5B%5D%2C%5B3%2C9%2C11%5D%2C%5B2%5D%2C%5B2%5D%5D&checkedLevels=0D1"
+    fetch = (vector_fetch or fetch_vector_data) if is_vector_url(url) else (table_fetch or fetch_csv_from_url)
+    return fetch(url) if columns is None else fetch(url, columns=columns)
 
 
-def process_page32_data():
-    """
-    Fetch foreign control data from StatCan and process for Page 32.
-    
-    Returns percentage of total assets under foreign control for different industries.
+# =============================================================================
+# AGGREGATION HELPERS
+# =============================================================================
+# A page reduces StatCan tables to one value per year and series. Rows are
+# classified once and every year is summed in a single groupby, rather than
+# re-filtering the table and re-running the label regexes for each year.
+
+def regex(pattern, match=False, case=True):
+    """Label matcher for page specs: a regex instead of an exact label.
     
-    Returns list of tuples for data.csv and metadata.csv
+    With match=True the pattern is anchored at the start (str.match),
+    otherwise it may match anywhere in the label (str.contains).
     """
-    print("Processing Page 32: Foreign Control of Canadian Assets...")
-    
-    df = fetch_csv_from_url(get_foreign_control_url())
+    return ('regex', pattern, match, case)
+
+
+def label_mask(series, pattern, match=False, case=True):
+    """Boolean mask of rows whose label matches a regex.
     
-    print(f"  Total rows fetched: {len(df)}")
+    The regex runs once per distinct label instead of once per row.
+    """
+    labels = pd.Series(series.dropna().unique(), dtype=object)
+    if match:
+        hits = labels.str.match(pattern, case=case)
+    else:
+        hits = labels.str.contains(pattern, case=case, regex=True)
+    return series.isin(labels[hits.astype(bool)])
+
+
+def ref_years(ref_date):
+    """REF_DATE as numbers, like pd.to_numeric(errors='coerce').
     
-    # Column names
-    naics_col = 'North American Industry Classification System (NAICS)'
+    A categorical column is converted once per distinct date.
+    """
+    if not isinstance(ref_date.dtype, pd.CategoricalDtype):
+        return pd.to_numeric(ref_date, errors='coerce')
+    years = pd.to_numeric(pd.Series(ref_date.cat.categories, dtype=object), errors='coerce').to_numpy()
+    codes = ref_date.cat.codes.to_numpy()
+    if (codes < 0).any():
+        # Code -1 (missing) picks the appended NaN
+        years = np.append(years.astype(float), np.nan)
+    return pd.Series(years[codes], index=ref_date.index)
+
+
+def matcher_mask(column, matcher):
+    """Boolean mask for one spec matcher: exact label, list of labels or regex()."""
+    if isinstance(matcher, tuple) and matcher[0] == 'regex':
+        _, pattern, match, case = matcher
+        return label_mask(column, pattern, match=match, case=case)
+    if isinstance(matcher, list):
+        return column.isin(matcher)
+    return column == matcher
+
+
+def sum_by_year(df, year, groups):
+    """Sum VALUE per year for several (possibly overlapping) row masks at once.
     
-    # Print unique industry names for debugging
-    unique_industries = df[naics_col].unique().tolist()
-    print(f"  Found {len(unique_industries)} unique industries:")
-    for ind in unique_industries:
-        print(f"    - {ind}")
+    groups maps a column name to a boolean mask over df. Returns a DataFrame
+    indexed by every year present in `year`, with 0 where a group has no rows.
+    """
+    values = df['VALUE'].to_numpy(dtype=float)
+    columns = {name: np.where(mask.to_numpy(dtype=bool), values, 0.0) for name, mask in groups.items()}
+    return pd.DataFrame(columns, index=df.index).groupby(year).sum()
+
+
+def first_by_year(df, year, groups):
+    """Take the first VALUE (in file order) per year for several row masks.
     
-    # Map industries to keys
-    industry_mapping = {
-        'Total non-financial industries (excluding management of companies and enterprises)': 'all_non_financial',
-        'Oil and gas extraction and support activities [211, 213]': 'oil_gas',
-        'Utilities [22]': 'utilities'
+    Missing values are kept as NaN, like reading .values[0] of the matching
+    rows. Returns a DataFrame indexed by every year present in `year`.
+    """
+    years = np.sort(year.dropna().unique())
+    parts = [pd.DataFrame({'year': year[mask], 'series': name, 'VALUE': df.loc[mask, 'VALUE']})
+             for name, mask in groups.items()]
+    long = pd.concat(parts).dropna(subset=['year']).drop_duplicates(['year', 'series'], keep='first')
+    return (long.pivot(index='year', columns='series', values='VALUE')
+            .reindex(index=years, columns=list(groups)))
+
+
+# =============================================================================
+# PAGE SPECIFICATIONS
+# =============================================================================
+# Every page is declared here instead of in a hand-written processor.
+#
+# A page lists its sources: a StatCan download (url), optional row filters
+# (where, min_year) and the series it reads from that table. Each series is a
+# set of column matchers (exact label, list of labels, or regex()) and is
+# reduced per year with agg "sum" (default) or "first" (first row in file
+# order; missing values become `missing`, NaN by default). The first source
+# defines the page's years.
+#
+# The page's vectors are formulas over its series and the vectors listed
+# before them: (key, formula, decimals, title, uom, scalar_factor). Formulas
+# may use fill0(x) to treat missing values as 0 and positive(x) to drop values
+# that are not above 0. A year is written when `keep` (if given) holds; missing
+# values are never written. Vectors are named page<NN>_<key>.
+#
+# data.csv lists a page's vectors in spec order; metadata.csv does too unless
+# `metadata_order` lists the keys in the order its rows are published in.
+
+NAICS_COL = 'North American Industry Classification System (NAICS)'
+
+# Page 31 energy industries summed for the FDI/CDIA totals
+ENERGY_INDUSTRIES = [
+    'Oil and gas extraction [211]',
+    'Support activities for mining and oil and gas extraction [213]',
+    'Utilities [22]',
+    'Petroleum and coal products manufacturing [324]',
+]
+
+# Page 37 environmental protection activities
+ENV_ACTIVITIES = {
+    'wastewater': 'Wastewater management',
+    'soil': 'Protection and remediation of soil, groundwater and surface water',
+    'air': 'Air pollution management',
+    'solid_waste': 'Solid waste management',
+    'total': 'Total, environmental protection activities',
+    # Summed into "Other" (as per the factbook). Excludes: Noise and vibration
+    # abatement, Protection against radiation, Clean vehicles and transportation technologies
+    'biodiversity': 'Protection of biodiversity and habitat',
+    'charges': 'Environmental charges',
+    'other_activities': 'Other environmental protection activities',
+}
+
+# Page 37 industries
+ENV_INDUSTRIES = {
+    'oil_gas': 'Oil and gas extraction [211]',
+    'electric': 'Electric power generation, transmission and distribution [2211]',
+    'natural_gas': 'Natural gas distribution [2212]',
+    'petroleum': 'Petroleum and coal product manufacturing [324]',
+    'all_industries': 'Total, industries',
+}
+
+
+def _env_series(industry, activities):
+    return {
+        f'{industry}_{activity}': {'Industries': ENV_INDUSTRIES[industry],
+                                   'Environmental protection activities': ENV_ACTIVITIES[activity]}
+        for activity in activities
     }
+
+
+CAPITAL_EXPENDITURES_ONLY = {'Capital and repair expenditures': 'Capital expenditures'}
+
+PAGE_SPECS = {
+    'page24': {
+        'title': 'Capital Expenditures',
+        'sources': [{
+            'url': get_capital_expenditures_url,
+            'where': CAPITAL_EXPENDITURES_ONLY,
+            'series': {
+                'oil_gas': {NAICS_COL: regex(r'^Oil and gas extraction \[211\]$', match=True)},
+                'electricity': {NAICS_COL: regex(r'\[2211\]')},
+                'other': {NAICS_COL: regex(r'\[213\]|\[2212\]|\[324\]|\[486\]')},
+            },
+        }],
+        'keep': 'total > 0',
+        'vectors': [
+            ('oil_gas', 'oil_gas', 1, 'Capital expenditures - Oil and gas extraction', 'Millions of dollars', 'millions'),
+            ('electricity', 'electricity', 1, 'Capital expenditures - Electric power', 'Millions of dollars', 'millions'),
+            ('other', 'other', 1, 'Capital expenditures - Other energy', 'Millions of dollars', 'millions'),
+            ('total', 'oil_gas + electricity + other', 1, 'Capital expenditures - Total energy sector', 'Millions of dollars', 'millions'),
+        ],
+    },
+    'page25': {
+        'title': 'Infrastructure Stock',
+        'sources': [{
+            'url': get_infrastructure_url,
+            'series': {key: {'VECTOR': vector} for key, vector in INFRA_VECTORS.items()},
+        }],
+        'keep': 'total > 0',
+        'vectors': [
+            ('fuel_energy_pipelines', 'fuel_and_energy + pipeline_transport', 1, 'Infrastructure - Fuel, energy and pipelines', 'Millions of dollars', 'millions'),
+            ('transport', 'transport - pipeline_transport', 1, 'Infrastructure - Transport (less pipelines)', 'Millions of dollars', 'millions'),
+            ('health_housing', 'health + housing', 1, 'Infrastructure - Health and housing', 'Millions of dollars', 'millions'),
+            ('education', 'education', 1, 'Infrastructure - Education', 'Millions of dollars', 'millions'),
+            ('public_safety', 'public_order + transit + communication + recreation', 1, 'Infrastructure - Public safety and other', 'Millions of dollars', 'millions'),
+            ('environmental', 'environmental', 1, 'Infrastructure - Environmental protection', 'Millions of dollars', 'millions'),
+            ('total', 'fuel_energy_pipelines + transport + health_housing + education + public_safety + environmental', 1, 'Infrastructure - Total net stock', 'Millions of dollars', 'millions'),
+        ],
+    },
+    'page26': {
+        'title': 'Economic Contributions',
+        'sources': [{
+            'url': get_economic_contributions_url,
+            'agg': 'first',
+            'missing': 0,
+            'series': {key: {'VECTOR': vector} for key, vector in ECON_VECTORS.items()},
+        }, {
+            'url': get_capital_expenditures_url,
+            'where': CAPITAL_EXPENDITURES_ONLY,
+            'series': {
+                # Fuel/energy/pipeline related capital expenditures
+                'investment': {NAICS_COL: regex(r'\[211\]|\[2211\]|\[2212\]|\[486\]|\[324\]')},
+            },
+        }],
+        'keep': '(jobs != 0) | (employment_income != 0) | (gdp != 0)',
+        'vectors': [
+            # Jobs are in thousands from StatCan, convert to actual
+            ('jobs', '(jobs_direct + jobs_indirect) * 1000', 0, 'Economic contributions - Jobs (direct + indirect)', 'Number', 'units'),
+            ('employment_income', 'income_direct + income_indirect', 1, 'Economic contributions - Employment income', 'Millions of dollars', 'millions'),
+            ('gdp', 'gdp_direct + gdp_indirect', 1, 'Economic contributions - GDP', 'Millions of dollars', 'millions'),
+            ('investment_value', 'investment', 1, 'Annual investment - Fuel, energy and pipelines', 'Millions of dollars', 'millions'),
+        ],
+    },
+    'page27': {
+        'title': 'Investment by Asset Type',
+        'sources': [{
+            'url': get_investment_by_asset_url,
+            'min_year': 2009,
+            # Exact asset names from StatCan Table 36-10-0608-01
+            'series': {
+                'wind_solar': {'Asset': 'Wind and solar power plants'},
+                'steam_thermal': {'Asset': 'Steam production plants'},
+                'nuclear': {'Asset': 'Nuclear production plants'},
+                'hydraulic': {'Asset': 'Hydraulic production plants'},
+                'other_electric': {'Asset': 'Other electric power construction'},
+                'transmission_networks': {'Asset': 'Power transmission networks'},
+                'distribution_networks': {'Asset': 'Power distribution networks'},
+                'pipelines': {'Asset': 'Pipelines'},
+                'transformers': {'Asset': 'Power and distribution transformers'},
+            },
+        }],
+        'keep': 'total > 0',
+        'vectors': [
+            ('transmission_distribution', 'transmission_networks + distribution_networks + transformers', 1, 'Investment - Transmission, distribution and transformers', 'Millions of dollars', 'millions'),
+            ('pipelines', 'pipelines', 1, 'Investment - Pipelines', 'Millions of dollars', 'millions'),
+            ('nuclear', 'nuclear', 1, 'Investment - Nuclear production plants', 'Millions of dollars', 'millions'),
+            ('other_electric', 'other_electric', 1, 'Investment - Other electric power construction', 'Millions of dollars', 'millions'),
+            ('hydraulic', 'hydraulic', 1, 'Investment - Hydraulic production plants', 'Millions of dollars', 'millions'),
+            ('wind_solar', 'wind_solar', 1, 'Investment - Wind and solar power plants', 'Millions of dollars', 'millions'),
+            ('steam_thermal', 'steam_thermal', 1, 'Investment - Steam production plants', 'Millions of dollars', 'millions'),
+            ('total', 'transmission_distribution + pipelines + nuclear + other_electric + hydraulic + wind_solar + steam_thermal', 1, 'Investment - Total fuel, energy and pipeline', 'Millions of dollars', 'millions'),
+        ],
+    },
+    'page31': {
+        'title': 'International Investments',
+        'sources': [{
+            'url': get_international_investment_url,
+            'min_year': 2007,
+            'series': {
+                # The URL returns child categories [211], [213] instead of parent [21]
+                'cdia': {NAICS_COL: ENERGY_INDUSTRIES,
+                         'Canadian and foreign direct investment': regex('Canadian direct investment abroad', case=False)},
+                'fdi': {NAICS_COL: ENERGY_INDUSTRIES,
+                        'Canadian and foreign direct investment': regex('Foreign direct investment in Canada', case=False)},
+            },
+        }],
+        'keep': '(cdia > 0) | (fdi > 0)',
+        'vectors': [
+            ('cdia', 'cdia', 1, 'Canadian direct investment abroad (CDIA) - Energy industry', 'Millions of dollars', 'millions'),
+            ('fdi', 'fdi', 1, 'Foreign direct investment in Canada (FDI) - Energy industry', 'Millions of dollars', 'millions'),
+        ],
+    },
+    'page32': {
+        'title': 'Foreign Control of Canadian Assets',
+        'sources': [{
+            'url': get_foreign_control_url,
+            'min_year': 2010,
+            'agg': 'first',
+            'series': {
+                'all_non_financial': {NAICS_COL: 'Total non-financial industries (excluding management of companies and enterprises)'},
+                'oil_gas': {NAICS_COL: 'Oil and gas extraction and support activities [211, 213]'},
+                'utilities': {NAICS_COL: 'Utilities [22]'},
+            },
+        }],
+        'vectors': [
+            ('all_non_financial', 'all_non_financial', 1, 'Total non-financial industries - Percentage of total assets under foreign control', 'Percent', 'units'),
+            ('oil_gas', 'oil_gas', 1, 'Oil and gas extraction and support activities - Percentage of total assets under foreign control', 'Percent', 'units'),
+            ('utilities', 'utilities', 1, 'Utilities - Percentage of total assets under foreign control', 'Percent', 'units'),
+        ],
+        'metadata_order': ['utilities', 'oil_gas', 'all_non_financial'],
+    },
+    'page37': {
+        'title': 'Environmental Protection Expenditures',
+        'sources': [{
+            'url': get_environmental_protection_url,
+            'where': {'Expenditures': 'Total, expenditures'},
+            'agg': 'first',
+            'series': {
+                **_env_series('oil_gas', ENV_ACTIVITIES),
+                **_env_series('electric', ['total']),
+                **_env_series('natural_gas', ['total']),
+                **_env_series('petroleum', ['total', 'air', 'wastewater', 'solid_waste', 'soil']),
+                **_env_series('all_industries', ['total']),
+            },
+        }],
+        'vectors': [
+            ('oil_gas_wastewater', 'oil_gas_wastewater', None, 'Oil and gas extraction - Wastewater management', 'Millions of dollars', 'millions'),
+            ('oil_gas_soil', 'oil_gas_soil', None, 'Oil and gas extraction - Protection and remediation of soil, groundwater and surface water', 'Millions of dollars', 'millions'),
+            ('oil_gas_air', 'oil_gas_air', None, 'Oil and gas extraction - Air pollution management', 'Millions of dollars', 'millions'),
+            ('oil_gas_solid_waste', 'oil_gas_solid_waste', None, 'Oil and gas extraction - Solid waste management', 'Millions of dollars', 'millions'),
+            ('oil_gas_total', 'oil_gas_total', None, 'Oil and gas extraction - Total environmental protection expenditures', 'Millions of dollars', 'millions'),
+            ('oil_gas_other', 'positive(fill0(oil_gas_biodiversity) + fill0(oil_gas_charges) + fill0(oil_gas_other_activities))', None, 'Oil and gas extraction - Other environmental protection activities', 'Millions of dollars', 'millions'),
+            ('electric_total', 'electric_total', None, 'Electric power generation - Total environmental protection expenditures', 'Millions of dollars', 'millions'),
+            ('natural_gas_total', 'natural_gas_total', None, 'Natural gas distribution - Total environmental protection expenditures', 'Millions of dollars', 'millions'),
+            ('petroleum_total', 'petroleum_total', None, 'Petroleum and coal product manufacturing - Total environmental protection expenditures', 'Millions of dollars', 'millions'),
+            # Air + wastewater + solid waste + soil: the "pollution abatement and control" percentage in the factbook
+            ('petroleum_pollution', 'positive(fill0(petroleum_air) + fill0(petroleum_wastewater) + fill0(petroleum_solid_waste) + fill0(petroleum_soil))', None, 'Petroleum and coal product manufacturing - Pollution abatement and control', 'Millions of dollars', 'millions'),
+            ('all_industries_total', 'all_industries_total', None, 'Total industries - Total environmental protection expenditures', 'Millions of dollars', 'millions'),
+        ],
+        'metadata_order': ['oil_gas_total', 'oil_gas_wastewater', 'oil_gas_soil', 'oil_gas_air', 'oil_gas_solid_waste',
+                           'oil_gas_other', 'electric_total', 'natural_gas_total', 'petroleum_total',
+                           'petroleum_pollution', 'all_industries_total'],
+    },
+}
+
+
+# =============================================================================
+# AGGREGATION PLAN
+# =============================================================================
+# compile_plan() turns a set of page specs into the distinct downloads they
+# need and one aggregation pass per (download, row filter, agg) combination.
+# Series from different pages that read the same slice of a table are reduced
+# in the same pass, so each table is scanned once no matter how many pages use it.
+
+# Columns every pass reads besides the ones its where and series matchers name
+PASS_COLUMNS = ('REF_DATE', 'VALUE')
+
+
+def with_start_year(url, year):
+    """Move a download URL's startDate up to January 1 of year.
     
-    # Convert year
-    df['year'] = pd.to_numeric(df['REF_DATE'], errors='coerce')
+    The URL's own startDate is kept when it is already later, and year=None
+    leaves the URL untouched (full history).
+    """
+    if year is None:
+        return url
+    match = re.search(r'startDate=(\d{8})', url)
+    start = f"{year}0101"
+    if match is None or match.group(1) >= start:
+        return url
+    return url[:match.start(1)] + start + url[match.end(1):]
+
+
+def _source_url(source, download_urls=None):
+    url = source['url']()
+    return (download_urls or {}).get(url, url)
+
+
+def _source_pass_key(source, download_urls=None):
+    return (
+        _source_url(source, download_urls),
+        tuple(sorted((column, repr(matcher)) for column, matcher in source.get('where', {}).items())),
+        source.get('min_year'),
+        source.get('agg', 'sum'),
+    )
+
+
+def compile_plan(pages=None, start_years=None, vectors=False):
+    """Compile page specs into the table downloads and aggregation passes they need.
+    
+    start_years maps a page to the first year it needs (incremental refresh);
+    pages without one need full history. A table shared by several pages is
+    requested from the earliest year any of them needs.
+    
+    With vectors, a table whose sources only select series by VECTOR is
+    requested as those vectors from the WDS instead (see vector_data_url).
+    
+    Returns a dict with:
+    - urls: every distinct download URL, in first-use order
+    - passes: {pass_key: {'url', 'where', 'min_year', 'agg', 'series'}} where
+      series maps '<page>.<series>' to its column matchers
+    - pages: the page names in output order
+    - start_years: the first year to keep per page (None for full history)
+    - url_starts: the first year requested per base download URL
+    - download_urls: {base download URL: URL actually requested}
+    - columns: {url: column names} the passes read from each download
+    - page_passes: {page: [pass keys]} the passes each page is evaluated from,
+      i.e. the tables it waits on (see run_plan)
+    """
+    pages = list(PAGE_SPECS) if pages is None else list(pages)
+    start_years = {page: (start_years or {}).get(page) for page in pages}
+    url_starts = {}
+    for page in pages:
+        for source in PAGE_SPECS[page]['sources']:
+            url, start = source['url'](), start_years[page]
+            if url not in url_starts:
+                url_starts[url] = start
+            elif url_starts[url] is not None:
+                url_starts[url] = None if start is None else min(url_starts[url], start)
+    download_urls = {url: with_start_year(url, start) for url, start in url_starts.items()}
+    
+    if vectors:
+        table_vectors = {}
+        for page in pages:
+            for source in PAGE_SPECS[page]['sources']:
+                url, ids = source['url'](), source_vectors(source)
+                if ids is None or table_vectors.get(url, ()) is None:
+                    table_vectors[url] = None
+                else:
+                    table_vectors[url] = sorted(set(table_vectors.get(url, ())) | set(ids))
+        for url, ids in table_vectors.items():
+            if ids:
+                download_urls[url] = vector_data_url(ids, download_urls[url])
+    
+    urls, passes, columns, page_passes = [], {}, {}, {}
+    for page in pages:
+        for source in PAGE_SPECS[page]['sources']:
+            key = _source_pass_key(source, download_urls)
+            page_passes.setdefault(page, [])
+            if key not in page_passes[page]:
+                page_passes[page].append(key)
+            if key[0] not in urls:
+                urls.append(key[0])
+            url_columns = columns.setdefault(key[0], set(PASS_COLUMNS))
+            url_columns.update(source.get('where', {}))
+            for matchers in source['series'].values():
+                url_columns.update(matchers)
+            plan_pass = passes.setdefault(key, {
+                'url': key[0],
+                'where': source.get('where', {}),
+                'min_year': source.get('min_year'),
+                'agg': source.get('agg', 'sum'),
+                'series': {},
+            })
+            for name, matchers in source['series'].items():
+                plan_pass['series'][f'{page}.{name}'] = matchers
+    return {'urls': urls, 'passes': passes, 'pages': pages,
+            'start_years': start_years, 'url_starts': url_starts, 'download_urls': download_urls,
+            'columns': {url: sorted(url_columns) for url, url_columns in columns.items()},
+            'page_passes': page_passes}
+
+
+def run_pass(df, plan_pass, metrics=None):
+    """Reduce one table to a year x series DataFrame in a single vectorized pass.
     
-    # Filter for years 2010 onwards
-    df = df[df['year'] >= 2010].copy()
+    Returns None (after printing a warning) if the table lacks a needed column.
+    With metrics, the rows before and after filtering are recorded.
+    """
+    pass_start = time.perf_counter()
+    rows_in = len(df)
+    columns = set(plan_pass['where'])
+    for matchers in plan_pass['series'].values():
+        columns.update(matchers)
+    missing = sorted(columns - set(df.columns))
+    if missing:
+        print(f"  WARNING: Columns {missing} not found!")
+        print(f"  Available columns: {df.columns.tolist()}")
+        return None
+    
+    for column, matcher in plan_pass['where'].items():
+        df = df[matcher_mask(df[column], matcher)]
+    year = ref_years(df['REF_DATE'])
+    if plan_pass['min_year'] is not None:
+        df = df[year >= plan_pass['min_year']]
+        year = year[year >= plan_pass['min_year']]
+    
+    # Every distinct (column, matcher) is evaluated once per pass
+    column_masks = {}
+    def mask_for(column, matcher):
+        key = (column, repr(matcher))
+        if key not in column_masks:
+            column_masks[key] = matcher_mask(df[column], matcher)
+        return column_masks[key]
+    
+    groups = {}
+    for name, matchers in plan_pass['series'].items():
+        mask = pd.Series(True, index=df.index)
+        for column, matcher in matchers.items():
+            mask &= mask_for(column, matcher)
+        groups[name] = mask
+    
+    if plan_pass['agg'] == 'first':
+        result = first_by_year(df, year, groups)
+    else:
+        result = sum_by_year(df, year, groups)
+    if metrics is not None:
+        selected = np.logical_or.reduce([mask.to_numpy(dtype=bool) for mask in groups.values()]) if groups else []
+        metrics.record_pass(url=plan_pass['url'], agg=plan_pass['agg'], series=len(groups),
+                            rows_in=rows_in, rows_after_filter=len(df), rows_selected=int(np.sum(selected)),
+                            seconds=round(time.perf_counter() - pass_start, 4))
+    return result
+
+
+def page_vectors(page):
+    """Names of the virtual vectors a page writes."""
+    return [f'{page}_{key}' for key, *_ in PAGE_SPECS[page]['vectors']]
+
+
+def page_metadata(page):
+    """Metadata rows of a page: (vector, title, uom, scalar_factor) for metadata.csv."""
+    spec = PAGE_SPECS[page]
+    rows = {key: (f'{page}_{key}', title, uom, scalar_factor)
+            for key, _, _, title, uom, scalar_factor in spec['vectors']}
+    return [rows[key] for key in spec.get('metadata_order', rows)]
+
+
+def _fill0(values):
+    return values.fillna(0)
+
+
+def _positive(values):
+    return values.where(values > 0)
+
+
+def evaluate_page(page, pass_results, download_urls=None):
+    """Evaluate one page's vector formulas from the aggregation pass results.
     
-    years = sorted(df['year'].dropna().unique())
-    data_rows = []
+    Returns list of tuples: (vector, year, value) for data.csv
+    and list of tuples: (vector, title, uom, scalar_factor) for metadata.csv
+    """
+    spec = PAGE_SPECS[page]
+    sources = [(source, pass_results[_source_pass_key(source, download_urls)]) for source in spec['sources']]
+    if any(result is None for _, result in sources):
+        return [], []
     
-    for year in years:
-        year_df = df[df['year'] == year]
-        year_int = int(year)
-        
-        for industry_name, key in industry_mapping.items():
-            industry_row = year_df[year_df[naics_col] == industry_name]
-            if not industry_row.empty:
-                value = industry_row['VALUE'].values[0]
-                if pd.notna(value):
-                    data_rows.append((f'page32_{key}', year_int, round(value, 1)))
-        
-        # Debug print for first and last years
-        if year_int == 2010 or year_int == max(years):
-            print(f"    {year_int}: Data processed")
+    years = sources[0][1].index
+    namespace = {}
+    for source, result in sources:
+        missing = source.get('missing', 0 if source.get('agg', 'sum') == 'sum' else np.nan)
+        for name in source['series']:
+            namespace[name] = result[f'{page}.{name}'].reindex(years).fillna(missing)
+    
+    functions = {'__builtins__': {}, 'fill0': _fill0, 'positive': _positive}
+    out = pd.DataFrame(index=years)
+    for key, formula, decimals, *_ in spec['vectors']:
+        out[key] = namespace[key] = eval(formula, functions, namespace)
+    
+    if spec.get('keep'):
+        out = out[eval(spec['keep'], functions, namespace)]
+    for key, _, decimals, *_ in spec['vectors']:
+        if decimals is not None:
+            out[key] = out[key].round(decimals)
+    
+    # Long format: year by year, vectors in spec order, missing values dropped
+    stacked = out.stack().dropna()
+    data_rows = [(f'{page}_{key}', int(year), float(value)) for (year, key), value in stacked.items()]
+    return data_rows, page_metadata(page)
+
+
+def run_plan(plan, cache=None, workers=1, metrics=None, partial=False, page_deadline=None):
+    """Fetch every table in a plan once, run its passes and evaluate its pages.
+    
+    The plan is run as a dependency graph: each page waits on its passes
+    (plan['page_passes']) and each pass on its table. Every download is
+    submitted up front to a pool of workers threads. The calling thread runs
+    a table's passes as soon as it arrives and evaluates a page as soon as
+    its last pass is done, while the other downloads continue. The run thus
+    takes as long as its slowest download-and-process chain, not the sum of
+    all of them. Returns {page: (data_rows, metadata_rows)} in plan order,
+    whatever order the pages completed in.
+    
+    page_deadline is the time budget in seconds of each page (None for no
+    limit), counted from the start of its first download, so pages queued
+    behind other downloads are not charged for the wait. A page still
+    waiting on a table past its budget fails with DeadlineExceeded while the
+    other pages carry on. Downloads no remaining page needs are not waited
+    for.
+    
+    By default the first failure aborts the run. With partial, a failed
+    download, pass or evaluation only fails the pages that depend on it: they
+    are left out of the results and recorded in metrics with status "failed".
+    """
+    if cache is None:
+        cache = TableCache()
+    errors = {}
+    
+    def attempt(key, work, *args):
+        try:
+            return work(*args)
+        except Exception as error:
+            if not partial:
+                raise
+            errors[key] = error
+            return None
+    
+    columns = plan.get('columns', {})
+    url_passes = {}
+    for key, plan_pass in plan['passes'].items():
+        url_passes.setdefault(plan_pass['url'], []).append(key)
+    page_urls = {page: {plan['passes'][key]['url'] for key in plan['page_passes'][page]}
+                 for page in plan['pages']}
+    waiting = {page: set(plan['page_passes'][page]) for page in plan['pages']}
+    pass_results = {}
+    results = {}
+    started = {}
+    run_start = time.perf_counter()
+    
+    def download(url):
+        started[url] = time.monotonic()
+        return cache.get(url, columns.get(url))
+    
+    def page_expires(page):
+        """When page's budget runs out, or None if none of its downloads has started yet."""
+        begun = [started[url] for url in page_urls[page] if url in started]
+        return min(begun) + page_deadline if begun else None
+    
+    def evaluate(page):
+        print(f"Processing Page {page[4:]}: {PAGE_SPECS[page]['title']}...")
+        page_start = time.perf_counter()
+        ready_s = round(page_start - run_start, 4)
+        failed = [errors[key] for key in [*plan['page_passes'][page], page] if key in errors]
+        with stage(metrics, "evaluate"):
+            page_result = None if failed else attempt(page, evaluate_page, page, pass_results,
+                                                      plan.get('download_urls'))
+        if page_result is None:
+            error = failed[0] if failed else errors[page]
+            print(f"  WARNING: Page {page[4:]} failed ({type(error).__name__}: {error})")
+            if metrics is not None:
+                metrics.record_page(page, status="failed", error=f"{type(error).__name__}: {error}",
+                                    ready_s=ready_s, seconds=round(time.perf_counter() - page_start, 4))
+            return
+        data_rows, metadata_rows = page_result
+        start = plan.get('start_years', {}).get(page)
+        if start is not None:
+            data_rows = [row for row in data_rows if row[1] >= start]
+        results[page] = (data_rows, metadata_rows)
+        if metrics is not None:
+            metrics.record_page(page, status="refreshed", data_rows=len(data_rows), start_year=start,
+                                ready_s=ready_s, seconds=round(time.perf_counter() - page_start, 4))
+        print(f"  Page {page[4:]}: {len(results[page][0])} data rows")
+    
+    def expire_pages():
+        """Fail the waiting pages whose budget is spent; return seconds until the next one runs out."""
+        now = time.monotonic()
+        timeout = None
+        for page in list(waiting):
+            expires = page_expires(page)
+            if expires is not None and expires <= now:
+                error = DeadlineExceeded(f"Page deadline of {page_deadline}s exceeded")
+                if not partial:
+                    raise error
+                errors[page] = error
+                del waiting[page]
+                evaluate(page)
+                continue
+            # A page whose downloads are still queued cannot run out sooner than page_deadline
+            left = page_deadline if expires is None else expires - now
+            timeout = left if timeout is None else min(timeout, left)
+        return timeout
+    
+    executor = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        with stage(metrics, "schedule"):
+            pending = {executor.submit(download, url): url for url in plan['urls']}
+            while waiting and pending:
+                timeout = expire_pages() if page_deadline is not None else None
+                if not waiting:
+                    break
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = pending.pop(future)
+                    table = attempt(url, future.result)
+                    if url in errors and metrics is not None:
+                        metrics.record_table(url, error=f"{type(errors[url]).__name__}: {errors[url]}")
+                    for key in url_passes.get(url, []):
+                        if not any(key in keys for keys in waiting.values()):
+                            continue
+                        if url in errors:
+                            errors[key] = errors[url]
+                        else:
+                            with stage(metrics, "aggregate"):
+                                pass_results[key] = attempt(key, run_pass, table, plan['passes'][key], metrics)
+                        # Pages whose last input this was are evaluated right away
+                        for page in list(waiting):
+                            if key in waiting[page]:
+                                waiting[page].discard(key)
+                                if not waiting[page]:
+                                    del waiting[page]
+                                    evaluate(page)
+    finally:
+        # Downloads only expired pages needed are left to their own timeouts
+        executor.shutdown(wait=False, cancel_futures=True)
+    return {page: results[page] for page in plan['pages'] if page in results}
+
+
+# =============================================================================
+# DERIVED METRICS
+# =============================================================================
+# After the page vectors are merged, refresh_all_data() derives the
+# percentages the pages display from them, so the frontend reads them instead
+# of recomputing them on every render. Per page:
+# - shares: {denominator: [parts]} -> <part>_share, percent of the denominator
+# - yoy: [keys] -> <key>_yoy, percent change from the previous calendar year
+#
+# Each kind is computed on a (years x vectors) array over a gapless year axis
+# at once, so growth always spans one calendar year: a year whose previous
+# year is missing gets no growth rather than one over a longer span. Years where a
+# metric is undefined (no or non-positive base) get no row, like missing
+# values in data.csv. Only metrics a page reads are declared here.
+
+DERIVED_DECIMALS = 4
+
+DERIVED_SPECS = {
+    # Page25.jsx: pie chart percentages and subtitle
+    'page25': {
+        'shares': {'total': ['fuel_energy_pipelines', 'transport', 'health_housing', 'education',
+                             'public_safety', 'environmental']},
+    },
+    # Page32.jsx: FDI and CDIA growth bullets
+    'page31': {
+        'yoy': ['cdia', 'fdi'],
+    },
+    # Page37.jsx: pie chart percentages, subtitle and text
+    'page37': {
+        'shares': {
+            'oil_gas_total': ['oil_gas_wastewater', 'oil_gas_soil', 'oil_gas_air', 'oil_gas_solid_waste',
+                              'oil_gas_other'],
+            'all_industries_total': ['oil_gas_total', 'electric_total', 'natural_gas_total', 'petroleum_total'],
+            'petroleum_total': ['petroleum_pollution'],
+        },
+    },
+}
+
+
+def _derived_keys(page):
+    # (derived key, kind, base key, denominator key) in output order
+    spec = DERIVED_SPECS.get(page, {})
+    keys = [(f'{part}_share', 'share', part, denominator)
+            for denominator, parts in spec.get('shares', {}).items() for part in parts]
+    keys += [(f'{key}_yoy', 'yoy', key, None) for key in spec.get('yoy', [])]
+    return keys
+
+
+def derived_vectors(page):
+    """Names of the derived vectors of a page (see DERIVED METRICS)."""
+    return [f'{page}_{key}' for key, *_ in _derived_keys(page)]
+
+
+def published_vectors(page):
+    """Page vectors followed by the derived vectors, as published to the frontend."""
+    return page_vectors(page) + derived_vectors(page)
+
+
+def derived_metadata(page):
+    """Metadata rows of a page's derived vectors."""
+    titles = {key: title for key, _, _, title, *_ in PAGE_SPECS[page]['vectors']}
+    descriptions = {
+        'share': lambda base, denominator: f"{titles[base]} (percent of {titles[denominator]})",
+        'yoy': lambda base, _: f"{titles[base]} - Year-over-year change",
+    }
+    return [(f'{page}_{key}', descriptions[kind](base, denominator), 'Percent', 'units')
+            for key, kind, base, denominator in _derived_keys(page)]
+
+
+def _ratio(numerator, denominator, valid):
+    out = np.full(numerator.shape, np.nan)
+    np.divide(numerator, denominator, out=out, where=valid)
+    return out
+
+
+def derive_page(page, wide):
+    """Derived vectors of one page from its wide frame (years x page vectors).
+
+    Returns a (years x derived vectors) array on a gapless year axis, and
+    that axis.
+    """
+    years = np.arange(wide.index.min(), wide.index.max() + 1)
+    wide = wide.reindex(index=years, columns=page_vectors(page))
+    columns = {vector[len(page) + 1:]: i for i, vector in enumerate(wide.columns)}
+    values = wide.to_numpy(dtype=np.float64)
+    keys = _derived_keys(page)
+    out = np.full((len(years), len(keys)), np.nan)
+
+    def block(kind):
+        return [i for i, key in enumerate(keys) if key[1] == kind]
+
+    with np.errstate(invalid='ignore'):
+        shares = block('share')
+        if shares:
+            parts = values[:, [columns[keys[i][2]] for i in shares]]
+            totals = values[:, [columns[keys[i][3]] for i in shares]]
+            out[:, shares] = _ratio(parts, totals, totals > 0) * 100
+        growth = block('yoy')
+        if growth and len(years) > 1:
+            series = values[:, [columns[keys[i][2]] for i in growth]]
+            current, previous = series[1:], series[:-1]
+            out[1:, growth] = (_ratio(current, previous, previous > 0) - 1) * 100
+    return out, years
+
+
+def add_derived_metrics(data_df):
+    """data_df with the derived vectors of every page in DERIVED_SPECS replaced by fresh ones."""
+    derived = [vector for page in DERIVED_SPECS for vector in derived_vectors(page)]
+    data_df = data_df[~data_df['vector'].isin(derived)]
+    frames = [data_df]
+    for page in DERIVED_SPECS:
+        rows = data_df[data_df['vector'].isin(page_vectors(page))]
+        if rows.empty:
+            continue
+        out, years = derive_page(page, rows.pivot(index='ref_date', columns='vector', values='value'))
+        # Long format: year by year, vectors in spec order, undefined values dropped
+        out = np.round(out, DERIVED_DECIMALS)
+        vectors = np.array(derived_vectors(page), dtype=object)
+        defined = ~np.isnan(out)
+        frames.append(pd.DataFrame({
+            'vector': np.broadcast_to(vectors, out.shape)[defined],
+            'ref_date': np.broadcast_to(years[:, None], out.shape)[defined],
+            'value': out[defined],
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+# =============================================================================
+# PAGE PROCESSORS
+# =============================================================================
+# Each processor evaluates a single page's spec. refresh_all_data() compiles
+# all pages into one plan instead, so shared tables are scanned only once.
+
+def process_page24_data(cache=None):
+    """Capital expenditures (Table 34-10-0036-01) for Page 24."""
+    return run_plan(compile_plan(['page24']), cache)['page24']
+
+
+def process_page25_data(cache=None):
+    """Infrastructure stock (Table 36-10-0608-01) for Page 25."""
+    return run_plan(compile_plan(['page25']), cache)['page25']
+
+
+def process_page26_data(cache=None):
+    """Economic contributions (Tables 36-10-0610-01 and 34-10-0036-01) for Page 26."""
+    return run_plan(compile_plan(['page26']), cache)['page26']
+
+
+def process_page27_data(cache=None):
+    """Investment by asset type (Table 36-10-0608-01) for Page 27."""
+    return run_plan(compile_plan(['page27']), cache)['page27']
+
+
+def process_page31_data(cache=None):
+    """International investments, FDI and CDIA (Table 36-10-0009-01) for Page 31."""
+    return run_plan(compile_plan(['page31']), cache)['page31']
+
+
+def process_page32_data(cache=None):
+    """Foreign control of Canadian assets (Table 33-10-0570-01) for Page 32."""
+    return run_plan(compile_plan(['page32']), cache)['page32']
+
+
+def process_page37_data(cache=None):
+    """Environmental protection expenditures (Table 38-10-0130-01) for Page 37."""
+    return run_plan(compile_plan(['page37']), cache)['page37']
+
+
+# =============================================================================
+# INCREMENTAL REFRESH
+# =============================================================================
+# An incremental refresh only requests the years after the latest ref_date
+# already stored for each page, plus a revision window of stored years that is
+# re-requested because StatCan restates recent periods. The refreshed years
+# replace the stored ones; older stored years are kept as they are.
+
+# Number of stored years re-requested on every incremental refresh
+REVISION_WINDOW = 2
+
+
+def load_stored_data():
+    """Read the current data.csv, or return None if there is none yet."""
+    data_path, _ = get_data_paths()
+    if not os.path.exists(data_path):
+        return None
+    return pd.read_csv(data_path, float_precision="round_trip")
+
+
+def incremental_start_years(stored_df, revision_window=REVISION_WINDOW, pages=None):
+    """First year to refresh per page, from the latest stored ref_date per vector.
     
-    # Metadata
-    metadata_rows = [
-        ('page32_utilities', 'Utilities - Percentage of total assets under foreign control', 'Percent', 'units'),
-        ('page32_oil_gas', 'Oil and gas extraction and support activities - Percentage of total assets under foreign control', 'Percent', 'units'),
-        ('page32_all_non_financial', 'Total non-financial industries - Percentage of total assets under foreign control', 'Percent', 'units'),
-    ]
+    A page restarts from its least up-to-date vector, minus the revision
+    window. Pages with any vector not stored yet (e.g. one just added to
+    their spec) get None (full history), so that vector gets all its years.
+    """
+    pages = list(PAGE_SPECS) if pages is None else list(pages)
+    latest = {} if stored_df is None else stored_df.groupby('vector')['ref_date'].max()
+    start_years = {}
+    for page in pages:
+        vectors = page_vectors(page)
+        if all(vector in latest for vector in vectors):
+            start_years[page] = min(int(latest[vector]) for vector in vectors) + 1 - revision_window
+        else:
+            start_years[page] = None
+    return start_years
+
+
+def merge_incremental(stored_df, results, start_years, pages=None):
+    """Combine stored rows with freshly refreshed rows, page by page.
     
-    print(f"  Page 32: {len(data_rows)} data rows")
-    return data_rows, metadata_rows
+    Stored rows of a page are kept for the years before its start year and
+    replaced from there on. Pages missing from results were skipped and keep
+    all their stored rows. Returns list of (vector, year, value) tuples in
+    page order.
+    """
+    pages = list(PAGE_SPECS) if pages is None else list(pages)
+    rows = []
+    for page in pages:
+        stored = stored_df[stored_df['vector'].isin(page_vectors(page))]
+        if page not in results:
+            rows.extend(stored.itertuples(index=False, name=None))
+            continue
+        start = start_years.get(page)
+        if start is not None:
+            rows.extend(stored[stored['ref_date'] < start].itertuples(index=False, name=None))
+        rows.extend(results[page][0])
+    return rows
 
 
 # =============================================================================
-# PAGE 37: ENVIRONMENTAL PROTECTION EXPENDITURES
+# RELEASE MANIFEST
 # =============================================================================
+# Before downloading, the refresher asks StatCan's Web Data Service (WDS) for
+# the last release time of every source table in one getCubeMetadata call.
+# statcan_data/manifest.json records the release time each table was last
+# processed at, and a hash of the spec each page was last refreshed with.
+# Pages whose tables have not been republished since are skipped and keep
+# their stored rows, unless their spec changed or data.csv lacks any of their
+# vectors. STATCAN_WDS_URL (or STATCAN_HOST) points the check at a local
+# stand-in server. Like the response cache, the manifest is local refresh
+# state and ignored by git: without it, every page is simply refreshed.
+
+WDS_URL = os.environ.get("STATCAN_WDS_URL")
+
+
+def table_product_id(url):
+    """StatCan product id (8-digit table number) of a download URL."""
+    pid, _, _ = parse_member_selection(url)
+    return pid[:8]
+
 
-def process_page37_data():
-    """Process environmental protection expenditures data (Table 38-10-0130-01).
+def page_product_ids(page):
+    """Product ids of every table a page reads."""
+    return sorted({table_product_id(source['url']()) for source in PAGE_SPECS[page]['sources']})
+
+
+def fetch_release_times(product_ids, wds_url=None, timeout=30, deadline=None):
+    """Return {product_id: releaseTime} from the WDS getCubeMetadata endpoint.
     
-    Creates virtual vectors:
-    - page37_oil_gas_total: Oil and gas extraction total expenditures
-    - page37_oil_gas_wastewater: Oil and gas - Wastewater management
-    - page37_oil_gas_soil: Oil and gas - Protection and remediation of soil, groundwater and surface water
-    - page37_oil_gas_air: Oil and gas - Air pollution management
-    - page37_oil_gas_solid_waste: Oil and gas - Solid waste management
-    - page37_oil_gas_other: Oil and gas - Other environmental protection activities
-    - page37_electric_total: Electric power generation total expenditures
-    - page37_petroleum_total: Petroleum and coal product manufacturing total expenditures
-    - page37_all_industries_total: Total industries total expenditures
+    Tables the service does not report on are left out.
     """
-    print("\nProcessing Page 37 data (Environmental Protection Expenditures)...")
-    
-    url = get_environmental_protection_url()
-    response = requests.get(url)
+    response = get_session(deadline).post(f"{wds_url or wds_base_url()}/getCubeMetadata",
+                                  timeout=request_timeout(timeout, deadline),
+                                  json=[{"productId": int(pid)} for pid in product_ids])
     response.raise_for_status()
+    release_times = {}
+    for item in response.json():
+        cube = item.get("object") or {}
+        if item.get("status") == "SUCCESS" and cube.get("releaseTime"):
+            release_times[str(cube["productId"])] = cube["releaseTime"]
+    return release_times
+
+
+def get_manifest_path():
+    """Get path to the table release manifest."""
+    return os.path.join(get_data_dir(), "manifest.json")
+
+
+def load_manifest():
+    """Return the stored manifest, or an empty one if there is none yet."""
+    path = get_manifest_path()
+    if not os.path.exists(path):
+        return {"tables": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def store_manifest(manifest):
+    """Write the manifest atomically."""
+    write_json_atomic(get_manifest_path(), manifest, sort_keys=True)
+
+
+def page_spec_hash(page):
+    """SHA-256 of a page's spec; URL functions count by the URL they return, without the host."""
+    def encode(value):
+        if callable(value):
+            return value().removeprefix(STATCAN_HOST)
+        raise TypeError(f"Cannot hash {value!r} in the spec of {page}")
+    content = json.dumps(PAGE_SPECS[page], sort_keys=True, default=encode)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def unchanged_pages(release_times, manifest, pages=None, stored_vectors=None):
+    """Pages that need no refresh: every table has the same release time as in
+    the manifest, the page spec has the hash recorded there, and (given
+    stored_vectors) every vector of the page is stored."""
+    pages = list(PAGE_SPECS) if pages is None else list(pages)
+    tables = manifest.get("tables", {})
+    page_hashes = manifest.get("pages", {})
+    return [page for page in pages
+            if all(pid in release_times and tables.get(pid, {}).get("release_time") == release_times[pid]
+                   for pid in page_product_ids(page))
+            and page_hashes.get(page, {}).get("spec_hash") == page_spec_hash(page)
+            and (stored_vectors is None or set(page_vectors(page)) <= stored_vectors)]
+
+
+# =============================================================================
+# FRONTEND SHARDS
+# =============================================================================
+# Besides data.csv, every refresh writes one pre-shaped JSON shard per page
+# (e.g. page24.json) so the frontend only downloads and parses the page it
+# shows. A shard holds the sorted years and one value array per series, with
+# null where a year has no value:
+#
+#   {"page": "page24", "years": [2007, ...], "series": {"oil_gas": [41262.6, ...], ...}}
+#
+# shards.json lists every shard with a content hash the frontend appends to
+# the shard URL for cache-busting.
+#
+# Each page also gets a binary shard (e.g. page24.bin) with the same vectors,
+# which the frontend maps straight onto typed arrays instead of parsing text;
+# its page rows are then built from those arrays. The layout (all numbers
+# little-endian):
+#
+#   "NRCB" | uint32 version | uint32 header length | header JSON | padding to 8
+#   then per vector, 8-byte aligned: float64 values[count] | int16 years[count]
+#
+# The header maps each vector to [count, values offset, years offset], with
+# offsets counted from the first 8-byte boundary after the header JSON.
+# shards.json lists a page's binary shard under its "binary" key.
+
+BINARY_MAGIC = b"NRCB"
+BINARY_VERSION = 1
+
+def build_page_shard(data_df, page):
+    """Shape a page's rows of data_df into its JSON shard dict."""
+    rows = data_df[data_df['vector'].isin(published_vectors(page))]
+    wide = rows.pivot(index='ref_date', columns='vector', values='value').sort_index()
+    series = {}
+    for vector in published_vectors(page):
+        values = wide[vector] if vector in wide else pd.Series(np.nan, index=wide.index)
+        series[vector[len(page) + 1:]] = [None if pd.isna(value) else float(value) for value in values]
+    return {'page': page, 'years': [int(year) for year in wide.index], 'series': series}
+
+
+def _align8(size):
+    return -(-size // 8) * 8
+
+
+def build_binary_data(data_df, vectors):
+    """Pack the given vectors of data_df into the binary layout (see FRONTEND SHARDS).
     
-    df = pd.read_csv(io.StringIO(response.text))
-    print(f"  Downloaded {len(df)} rows from StatCan")
-    
-    # Filter for Total expenditures only
-    df = df[df['Expenditures'] == 'Total, expenditures'].copy()
-    
-    # Extract year from REF_DATE (format is just "2018", "2019", etc.)
-    df['year'] = df['REF_DATE'].astype(int)
-    
-    # Define main activity categories (shown individually in the pie chart)
-    main_activities = {
-        'wastewater': 'Wastewater management',
-        'soil': 'Protection and remediation of soil, groundwater and surface water',
-        'air': 'Air pollution management',
-        'solid_waste': 'Solid waste management',
-        'total': 'Total, environmental protection activities'
+    Returns bytes.
+    """
+    grouped = {vector: rows for vector, rows in data_df.groupby('vector', sort=False)}
+    header, blocks, offset = {}, [], 0
+    for vector in vectors:
+        rows = grouped.get(vector)
+        if rows is None:
+            continue
+        rows = rows.sort_values('ref_date')
+        years = rows['ref_date'].to_numpy()
+        if years.min() < np.iinfo(np.int16).min or years.max() > np.iinfo(np.int16).max:
+            raise ValueError(f"Years of {vector} do not fit the int16 year column")
+        values = rows['value'].to_numpy(dtype='<f8').tobytes()
+        block = values + years.astype('<i2').tobytes()
+        header[vector] = [len(rows), offset, offset + len(values)]
+        blocks.append(block + b"\0" * (_align8(len(block)) - len(block)))
+        offset += _align8(len(block))
+    header_json = json.dumps({'vectors': header}, separators=(',', ':')).encode("utf-8")
+    prefix = BINARY_MAGIC + np.array([BINARY_VERSION, len(header_json)], dtype='<u4').tobytes() + header_json
+    return prefix + b"\0" * (_align8(len(prefix)) - len(prefix)) + b"".join(blocks)
+
+
+def _publish_shard(file_name, content, data_dirs):
+    # Publish one shard and return its shards.json entry
+    publish_file(file_name, content, data_dirs)
+    return {
+        'file': file_name,
+        'hash': hashlib.sha256(content).hexdigest()[:16],
+        'bytes': len(content),
     }
+
+
+def write_page_shards(data_df, data_dirs=None):
+    """Write a JSON and a binary shard per page and the shards.json manifest.
     
-    # Categories to sum into "Other" (as per the factbook)
-    # Excludes: Noise and vibration abatement, Protection against radiation, Clean vehicles and transportation technologies
-    other_activities = [
-        'Protection of biodiversity and habitat',
-        'Environmental charges',
-        'Other environmental protection activities'
-    ]
-    
-    # Define industries
-    industries = {
-        'oil_gas': 'Oil and gas extraction [211]',
-        'electric': 'Electric power generation, transmission and distribution [2211]',
-        'natural_gas': 'Natural gas distribution [2212]',
-        'petroleum': 'Petroleum and coal product manufacturing [324]',
-        'all_industries': 'Total, industries'
+    Everything is published to every directory of data_dirs (default:
+    get_publish_dirs()), each file before the manifest that points at it.
+    Returns the manifest dict.
+    """
+    data_dirs = data_dirs or get_publish_dirs()
+    manifest = {'pages': {}}
+    for page in PAGE_SPECS:
+        content = json.dumps(build_page_shard(data_df, page), separators=(',', ':')).encode("utf-8")
+        manifest['pages'][page] = _publish_shard(f"{page}.json", content, data_dirs)
+        content = build_binary_data(data_df, published_vectors(page))
+        manifest['pages'][page]['binary'] = _publish_shard(f"{page}.bin", content, data_dirs)
+    publish_file("shards.json", json.dumps(manifest, indent=2).encode("utf-8"), data_dirs)
+    return manifest
+
+
+# =============================================================================
+# SQLITE STORE
+# =============================================================================
+# Optionally (refresh_all_data(sqlite=True), --sqlite) the refreshed rows are
+# also kept in statcan_data/factbook.sqlite for readers that query by vector
+# and year range instead of scanning data.csv. data is keyed by
+# (vector, ref_date) and metadata by vector, so both lookups are index seeks.
+#
+# A refresh stages its rows in a temporary table and applies the difference in
+# one transaction: new rows are inserted, changed values updated and vanished
+# rows deleted. Unchanged rows are never rewritten, so an incremental refresh
+# only touches the rows StatCan revised. The database runs in WAL mode, so
+# readers keep seeing the previous refresh until it commits instead of waiting
+# on it.
+
+SQLITE_FILE = "factbook.sqlite"
+
+# Rows per executemany() batch when staging a refresh
+SQLITE_BATCH_ROWS = 5000
+
+# Milliseconds a connection waits on a lock held by another writer
+SQLITE_BUSY_TIMEOUT = 30_000
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS data (
+    vector TEXT NOT NULL,
+    ref_date INTEGER NOT NULL,
+    value REAL,
+    PRIMARY KEY (vector, ref_date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS metadata (
+    vector TEXT PRIMARY KEY,
+    title TEXT,
+    uom TEXT,
+    scalar_factor TEXT
+) WITHOUT ROWID;
+"""
+
+# Columns of each table, key columns first
+SQLITE_TABLES = {
+    'data': (('vector', 'ref_date'), ('value',)),
+    'metadata': (('vector',), ('title', 'uom', 'scalar_factor')),
+}
+
+
+def get_sqlite_path():
+    """Path of the SQLite copy of data.csv and metadata.csv."""
+    return os.path.join(get_data_dir(), SQLITE_FILE)
+
+
+def connect_sqlite(path=None, readonly=False):
+    """Open the SQLite store in WAL mode, creating its tables unless readonly.
+
+    The connection is in autocommit mode; writers open their own transaction.
+    """
+    path = path or get_sqlite_path()
+    if readonly:
+        uri = "file:" + urllib.parse.quote(os.path.abspath(path).replace(os.sep, "/")) + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, isolation_level=None)
+    else:
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SQLITE_SCHEMA)
+    conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+    return conn
+
+
+def _sync_table(conn, table, rows):
+    # Stage rows, then upsert the new and changed ones and delete the vanished ones
+    keys, values = SQLITE_TABLES[table]
+    columns = keys + values
+    staged = f"staged_{table}"
+    conn.execute(f"CREATE TEMP TABLE {staged} ({', '.join(columns)}, "
+                 f"PRIMARY KEY ({', '.join(keys)})) WITHOUT ROWID")
+    insert = f"INSERT INTO {staged} VALUES ({', '.join('?' * len(columns))})"
+    for start in range(0, len(rows), SQLITE_BATCH_ROWS):
+        conn.executemany(insert, rows[start:start + SQLITE_BATCH_ROWS])
+    matches = " AND ".join(f"{staged}.{key} = {table}.{key}" for key in keys)
+    inserted = conn.execute(f"SELECT count(*) FROM {staged} WHERE NOT EXISTS "
+                            f"(SELECT 1 FROM main.{table} WHERE {matches})").fetchone()[0]
+    before = conn.total_changes
+    # "WHERE true" keeps SQLite from parsing ON CONFLICT as a join constraint
+    conn.execute(f"INSERT INTO main.{table} ({', '.join(columns)}) "
+                 f"SELECT {', '.join(columns)} FROM {staged} WHERE true "
+                 f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET "
+                 + ", ".join(f"{column} = excluded.{column}" for column in values)
+                 + " WHERE " + " OR ".join(f"{column} IS NOT excluded.{column}" for column in values))
+    updated = conn.total_changes - before - inserted
+    before = conn.total_changes
+    conn.execute(f"DELETE FROM main.{table} WHERE NOT EXISTS "
+                 f"(SELECT 1 FROM {staged} WHERE {matches})")
+    deleted = conn.total_changes - before
+    conn.execute(f"DROP TABLE {staged}")
+    return {'inserted': inserted, 'updated': updated, 'deleted': deleted}
+
+
+def write_sqlite(data_df, metadata_df, path=None):
+    """Make the SQLite store hold exactly data_df and metadata_df, in one transaction.
+
+    Returns {table: {'inserted', 'updated', 'deleted'}} row counts.
+    """
+    conn = connect_sqlite(path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            changes = {
+                'data': _sync_table(conn, 'data', list(data_df[['vector', 'ref_date', 'value']].itertuples(
+                    index=False, name=None))),
+                'metadata': _sync_table(conn, 'metadata', list(metadata_df[
+                    ['vector', 'title', 'uom', 'scalar_factor']].itertuples(index=False, name=None))),
+            }
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return changes
+
+
+def query_sqlite(conn, vectors, start=None, end=None):
+    """Rows (vector, ref_date, value) of vectors with start <= ref_date <= end, by primary key."""
+    query = "SELECT vector, ref_date, value FROM data WHERE vector = ? AND ref_date BETWEEN ? AND ?"
+    low = -(1 << 63) if start is None else int(start)
+    high = (1 << 63) - 1 if end is None else int(end)
+    rows = []
+    for vector in ([vectors] if isinstance(vectors, str) else vectors):
+        rows.extend(conn.execute(query, (vector, low, high)))
+    return pd.DataFrame(rows, columns=['vector', 'ref_date', 'value'])
+
+
+# =============================================================================
+# SNAPSHOT HISTORY
+# =============================================================================
+# data.csv only holds the latest values; StatCan's restatements of past years
+# overwrite them. statcan_data/history/ keeps every refresh that changed
+# data.csv as a delta against the previous one: a gzipped CSV of the
+# (vector, ref_date, value) rows that were added or changed, plus the keys
+# that were removed (removed=1). Refreshes that change nothing add nothing, so
+# the history grows with StatCan's revisions, not with the number of runs.
+#
+# history/index.json lists the snapshots in order:
+#
+#   {"snapshots": [{"id": 1, "refreshed_at": "...", "file": "00001.csv.gz",
+#                   "kind": "full", "rows": 484, "added": 484, "changed": 0, "removed": 0}, ...]}
+#
+# Every SNAPSHOT_CHECKPOINT_INTERVAL-th snapshot (and the first) is stored in
+# full, so rebuilding the data as of any snapshot replays at most that many
+# deltas (see snapshot_as_of).
+#
+# The history is state of the machine that runs the refreshes and is ignored
+# by git; back the directory up separately if it must outlive that machine.
+
+SNAPSHOT_CHECKPOINT_INTERVAL = 50
+
+SNAPSHOT_COLUMNS = ['vector', 'ref_date', 'value', 'removed']
+
+
+def get_history_dir():
+    """Ensure the snapshot history directory exists and return its path."""
+    path = os.path.join(get_data_dir(), "history")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def load_history_index():
+    """The snapshot list of history/index.json (empty without history)."""
+    path = os.path.join(get_history_dir(), "index.json")
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("snapshots", [])
+
+
+def _read_snapshot(entry):
+    return pd.read_csv(os.path.join(get_history_dir(), entry['file']), float_precision="round_trip")
+
+
+def snapshot_as_of(when=None, snapshot_id=None, index=None):
+    """Rebuild data.csv's rows as they were after a past refresh.
+
+    when selects the last snapshot refreshed at or before that time (a
+    datetime or ISO 8601 string), snapshot_id a snapshot by id; neither
+    selects the latest. Returns a (vector, ref_date, value) DataFrame, or
+    None if no snapshot is that old.
+    """
+    index = load_history_index() if index is None else index
+    if snapshot_id is not None:
+        selected = [entry for entry in index if entry['id'] <= snapshot_id]
+    elif when is not None:
+        when = pd.Timestamp(when)
+        when = when.tz_localize("UTC") if when.tzinfo is None else when
+        selected = [entry for entry in index if pd.Timestamp(entry['refreshed_at']) <= when]
+    else:
+        selected = index
+    if not selected:
+        return None
+    start = max(i for i, entry in enumerate(selected) if entry['kind'] == "full")
+    frames = [_read_snapshot(entry) for entry in selected[start:]]
+    # The last delta touching a key wins; removed keys are then dropped
+    rows = pd.concat(frames, ignore_index=True).drop_duplicates(['vector', 'ref_date'], keep='last')
+    rows = rows[rows['removed'] == 0].sort_values(['vector', 'ref_date'], kind='stable')
+    return rows[['vector', 'ref_date', 'value']].reset_index(drop=True)
+
+
+def diff_snapshot(previous_df, data_df):
+    """Rows of data_df that are new or changed against previous_df, plus removed keys.
+
+    Returns (delta DataFrame with SNAPSHOT_COLUMNS, counts dict).
+    """
+    current = data_df[['vector', 'ref_date', 'value']].assign(removed=0)
+    if previous_df is None:
+        return current, {'added': len(current), 'changed': 0, 'removed': 0}
+    merged = previous_df[['vector', 'ref_date', 'value']].merge(
+        current, on=['vector', 'ref_date'], how='outer', suffixes=('_old', ''), indicator=True)
+    added = merged['_merge'] == 'right_only'
+    removed = merged['_merge'] == 'left_only'
+    both = merged['_merge'] == 'both'
+    old, new = merged['value_old'], merged['value']
+    changed = both & (old != new) & ~(old.isna() & new.isna())
+    delta = merged[added | changed | removed].copy()
+    delta.loc[removed, 'value'] = np.nan
+    delta['removed'] = removed[delta.index].astype(int)
+    counts = {'added': int(added.sum()), 'changed': int(changed.sum()), 'removed': int(removed.sum())}
+    return delta[SNAPSHOT_COLUMNS].reset_index(drop=True), counts
+
+
+def record_snapshot(data_df, refreshed_at):
+    """Append data_df to the history as a delta against the latest snapshot.
+
+    Nothing is written when data_df equals the latest snapshot. Returns the
+    new index entry, or None.
+    """
+    index = load_history_index()
+    previous_df = snapshot_as_of(index=index)
+    delta, counts = diff_snapshot(previous_df, data_df)
+    if previous_df is not None and delta.empty:
+        return None
+    snapshot_id = index[-1]['id'] + 1 if index else 1
+    kind = "delta"
+    if previous_df is None or (snapshot_id - 1) % SNAPSHOT_CHECKPOINT_INTERVAL == 0:
+        kind = "full"
+        delta = data_df[['vector', 'ref_date', 'value']].assign(removed=0)
+    entry = {
+        'id': snapshot_id,
+        'refreshed_at': refreshed_at,
+        'file': f"{snapshot_id:05d}.csv.gz",
+        'kind': kind,
+        'rows': len(data_df),
+        **counts,
     }
-    
-    data_rows = []
-    
-    # Process each year
-    for year in df['year'].unique():
-        year_df = df[df['year'] == year]
-        
-        # Oil and gas extraction - main activities
-        for act_key, act_name in main_activities.items():
-            oil_gas_df = year_df[(year_df['Industries'] == industries['oil_gas']) & 
-                                  (year_df['Environmental protection activities'] == act_name)]
-            if len(oil_gas_df) > 0:
-                value = oil_gas_df['VALUE'].values[0]
-                if pd.notna(value):
-                    data_rows.append((f'page37_oil_gas_{act_key}', year, float(value)))
-        
-        # Oil and gas extraction - sum "other" categories
-        other_sum = 0
-        for other_act in other_activities:
-            oil_gas_other_df = year_df[(year_df['Industries'] == industries['oil_gas']) & 
-                                        (year_df['Environmental protection activities'] == other_act)]
-            if len(oil_gas_other_df) > 0:
-                value = oil_gas_other_df['VALUE'].values[0]
-                if pd.notna(value):
-                    other_sum += float(value)
-        if other_sum > 0:
-            data_rows.append(('page37_oil_gas_other', year, other_sum))
-        
-        # Electric power generation - total only
-        electric_df = year_df[(year_df['Industries'] == industries['electric']) & 
-                               (year_df['Environmental protection activities'] == main_activities['total'])]
-        if len(electric_df) > 0:
-            value = electric_df['VALUE'].values[0]
-            if pd.notna(value):
-                data_rows.append(('page37_electric_total', year, float(value)))
-        
-        # Natural gas distribution - total only
-        natural_gas_df = year_df[(year_df['Industries'] == industries['natural_gas']) & 
-                                  (year_df['Environmental protection activities'] == main_activities['total'])]
-        if len(natural_gas_df) > 0:
-            value = natural_gas_df['VALUE'].values[0]
-            if pd.notna(value):
-                data_rows.append(('page37_natural_gas_total', year, float(value)))
-        
-        # Petroleum and coal products - total only
-        petroleum_df = year_df[(year_df['Industries'] == industries['petroleum']) & 
-                                (year_df['Environmental protection activities'] == main_activities['total'])]
-        if len(petroleum_df) > 0:
-            value = petroleum_df['VALUE'].values[0]
-            if pd.notna(value):
-                data_rows.append(('page37_petroleum_total', year, float(value)))
-        
-        # Petroleum and coal products - pollution abatement categories (air + wastewater + solid waste + soil)
-        # These sum to the "pollution abatement and control" percentage in the factbook
-        pollution_categories = ['air', 'wastewater', 'solid_waste', 'soil']
-        pollution_sum = 0
-        for cat in pollution_categories:
-            petroleum_cat_df = year_df[(year_df['Industries'] == industries['petroleum']) & 
-                                        (year_df['Environmental protection activities'] == main_activities[cat])]
-            if len(petroleum_cat_df) > 0:
-                value = petroleum_cat_df['VALUE'].values[0]
-                if pd.notna(value):
-                    pollution_sum += float(value)
-        if pollution_sum > 0:
-            data_rows.append(('page37_petroleum_pollution', year, pollution_sum))
-        
-        # All industries - total only
-        all_ind_df = year_df[(year_df['Industries'] == industries['all_industries']) & 
-                              (year_df['Environmental protection activities'] == main_activities['total'])]
-        if len(all_ind_df) > 0:
-            value = all_ind_df['VALUE'].values[0]
-            if pd.notna(value):
-                data_rows.append(('page37_all_industries_total', year, float(value)))
-    
-    # Create metadata rows
-    metadata_rows = [
-        ('page37_oil_gas_total', 'Oil and gas extraction - Total environmental protection expenditures', 'Millions of dollars', 'millions'),
-        ('page37_oil_gas_wastewater', 'Oil and gas extraction - Wastewater management', 'Millions of dollars', 'millions'),
-        ('page37_oil_gas_soil', 'Oil and gas extraction - Protection and remediation of soil, groundwater and surface water', 'Millions of dollars', 'millions'),
-        ('page37_oil_gas_air', 'Oil and gas extraction - Air pollution management', 'Millions of dollars', 'millions'),
-        ('page37_oil_gas_solid_waste', 'Oil and gas extraction - Solid waste management', 'Millions of dollars', 'millions'),
-        ('page37_oil_gas_other', 'Oil and gas extraction - Other environmental protection activities', 'Millions of dollars', 'millions'),
-        ('page37_electric_total', 'Electric power generation - Total environmental protection expenditures', 'Millions of dollars', 'millions'),
-        ('page37_natural_gas_total', 'Natural gas distribution - Total environmental protection expenditures', 'Millions of dollars', 'millions'),
-        ('page37_petroleum_total', 'Petroleum and coal product manufacturing - Total environmental protection expenditures', 'Millions of dollars', 'millions'),
-        ('page37_petroleum_pollution', 'Petroleum and coal product manufacturing - Pollution abatement and control', 'Millions of dollars', 'millions'),
-        ('page37_all_industries_total', 'Total industries - Total environmental protection expenditures', 'Millions of dollars', 'millions'),
-    ]
-    
-    print(f"  Page 37: {len(data_rows)} data rows")
-    return data_rows, metadata_rows
+    # The delta file goes first: a snapshot exists once index.json lists it
+    history_dir = get_history_dir()
+    content = gzip.compress(delta.to_csv(index=False).encode("utf-8"), compresslevel=9, mtime=0)
+    write_if_changed(os.path.join(history_dir, entry['file']), content)
+    _write_json_atomic(os.path.join(history_dir, "index.json"), {'snapshots': index + [entry]})
+    return entry
 
 
 # =============================================================================
 # MAIN FUNCTION
 # =============================================================================
 
-def refresh_all_data():
-    """Fetch, process and save all page data from StatCan to data.csv and metadata.csv."""
+# Every StatCan download used by the pages
+TABLE_URLS = [
+    get_capital_expenditures_url,
+    get_infrastructure_url,
+    get_economic_contributions_url,
+    get_investment_by_asset_url,
+    get_international_investment_url,
+    get_foreign_control_url,
+    get_environmental_protection_url,
+]
+
+# Single-page entry points, in the order their rows are written to data.csv
+PAGE_PROCESSORS = [
+    process_page24_data,
+    process_page25_data,
+    process_page26_data,
+    process_page27_data,
+    process_page31_data,
+    process_page32_data,
+    process_page37_data,
+]
+
+
+def refresh_all_data(workers=1, cache_mode="revalidate", full=False, revision_window=REVISION_WINDOW,
+                     check_releases=True, deadline=REFRESH_DEADLINE, page_deadline=PAGE_DEADLINE,
+                     allow_stale=False, source="query", vectors=False, sqlite=False, history=True):
+    """Fetch, process and save all page data from StatCan to data.csv and metadata.csv.
+    
+    Per-page JSON shards for the frontend are written alongside (see
+    write_page_shards).
+    
+    All pages in PAGE_SPECS are compiled into one aggregation plan and run as
+    a dependency graph (see run_plan): up to workers StatCan downloads run at
+    once, and each page is processed as soon as its own tables have arrived.
+    Results are always combined in PAGE_SPECS order, so the output files do
+    not depend on workers or on the order downloads complete in.
+    
+    All pages share one TableCache, so a table used by several pages is only
+    downloaded and parsed once per refresh. cache_mode controls the on-disk raw
+    response cache (see CACHE_MODES); "offline" replays it without any network.
+    
+    By default the refresh is incremental: each page only requests the years
+    after its stored data plus revision_window years, and the result is merged
+    into data.csv. full=True rebuilds every page from its full history.
+    
+    With check_releases, pages whose tables StatCan has not republished since
+    the last refresh (see the release manifest) are skipped entirely, unless
+    their spec changed or data.csv lacks any of their vectors. Full
+    refreshes process every page but still record the release times; offline
+    refreshes make no check.
+    
+    Timings and sizes of every stage, table, pass and page are written to
+    run_report.json next to data.csv (see RunMetrics).
+    
+    deadline is the total time budget in seconds for the StatCan requests
+    (None for no limit). Downloads still pending past it fail with
+    DeadlineExceeded instead of waiting on a hung endpoint. page_deadline is
+    the budget of each page, counted from its first download (see run_plan).
+    
+    By default the first failure, including a page past its budget, aborts the
+    refresh and nothing is written. With allow_stale, a page whose tables fail
+    to download, time out or no longer evaluate keeps its rows from the
+    existing data.csv while the other pages are updated; its vectors, derived
+    ones included, are listed as stale_vectors in the run report.
+    
+    source "full-table" downloads every StatCan table once as a full-table zip
+    and answers the page queries from it (see FullTableSource) instead of
+    sending one query per page source. With vectors, tables read only by
+    vector id are requested as those vectors from the WDS (see VECTOR SOURCE).
+    
+    With sqlite, the rows are also applied row by row to factbook.sqlite
+    (see SQLITE STORE).
+    
+    With history (the default), a refresh that changes data.csv is recorded as
+    a delta snapshot, so earlier values stay retrievable (see SNAPSHOT HISTORY).
+    """
     print("=" * 60)
     print("Refreshing all data from Statistics Canada...")
     print("=" * 60)
     
     all_data = []
     all_metadata = []
+    metrics = RunMetrics()
+    refresh_deadline = None if deadline is None else Deadline(deadline)
+    if source not in SOURCES:
+        raise ValueError(f"Unknown source {source!r}, expected one of {SOURCES}")
+    if source == "full-table":
+        full_tables = table_fetch = FullTableSource(cache_mode=cache_mode, metrics=metrics,
+                                                    deadline=refresh_deadline)
+    else:
+        full_tables = None
+        table_fetch = partial(fetch_csv_from_url, cache_mode=cache_mode, metrics=metrics,
+                              deadline=refresh_deadline)
+    vector_fetch = partial(fetch_vector_data, cache_mode=cache_mode, metrics=metrics, deadline=refresh_deadline)
+    cache = TableCache(partial(fetch_source, table_fetch=table_fetch, vector_fetch=vector_fetch))
+    # Stored rows are needed for incremental refreshes and to carry failed pages forward
+    stored_df = load_stored_data() if not full or allow_stale else None
+    incremental = stored_df is not None and not full
+    start_years = None
+    if incremental:
+        start_years = incremental_start_years(stored_df, revision_window)
+        for page, start in start_years.items():
+            print(f"  Page {page[4:]}: " + (f"refreshing from {start}" if start
+                                            else "vectors missing from data.csv, full history"))
+    
+    # Skip pages whose tables have not been republished since the last refresh
+    pages = list(PAGE_SPECS)
+    product_ids = sorted({pid for page in pages for pid in page_product_ids(page)})
+    manifest = load_manifest()
+    release_times = {}
+    if check_releases and cache_mode != "offline":
+        try:
+            with metrics.stage("release_check"):
+                release_times = fetch_release_times(product_ids, deadline=refresh_deadline)
+        except (requests.RequestException, DeadlineExceeded, ValueError) as error:
+            print(f"  WARNING: Release check failed ({error}), refreshing every table")
+    if incremental:
+        stored_pages = [page for page in pages if start_years[page] is not None]
+        skipped = unchanged_pages(release_times, manifest, stored_pages, set(stored_df['vector']))
+        for page in skipped:
+            print(f"  Page {page[4:]}: tables unchanged since last refresh, skipping")
+            metrics.record_page(page, status="skipped")
+        pages = [page for page in pages if page not in skipped]
+    plan = compile_plan(pages, start_years=start_years, vectors=vectors)
+    
+    # Process every page from one plan: each table is downloaded and scanned once
+    if workers > 1:
+        print(f"Downloading {len(plan['urls'])} tables with {workers} workers...")
+    results = run_plan(plan, cache, workers=workers, metrics=metrics, partial=allow_stale,
+                       page_deadline=page_deadline)
+    failed_pages = [page for page in plan['pages'] if page not in results]
+    stale_vectors = []
+    if failed_pages:
+        stored_vectors = set() if stored_df is None else set(stored_df['vector'])
+        for page in failed_pages:
+            # Derived vectors are recomputed from the carried-forward rows, so they are stale too
+            stale = [vector for vector in published_vectors(page) if vector in stored_vectors]
+            stale_vectors.extend(stale)
+            print(f"  Page {page[4:]}: " + (f"keeping {len(stale)} stored vectors" if stale
+                                            else "no stored data to fall back on"))
+            metrics.record_page(page, stale=bool(stale))
+    
+    with metrics.stage("merge"):
+        if stored_df is not None:
+            # Pages missing from results (skipped or failed) keep their stored rows
+            all_data = merge_incremental(stored_df, results, start_years or {})
+        else:
+            for page_data, _ in results.values():
+                all_data.extend(page_data)
+        for page in PAGE_SPECS:
+            all_metadata.extend(page_metadata(page))
+            all_metadata.extend(derived_metadata(page))
+        
+        # Create DataFrames
+        data_df = pd.DataFrame(all_data, columns=['vector', 'ref_date', 'value'])
+        metadata_df = pd.DataFrame(all_metadata, columns=['vector', 'title', 'uom', 'scalar_factor'])
+        
+        # Remove duplicates
+        data_df = data_df.drop_duplicates(subset=['vector', 'ref_date'], keep='first')
+        metadata_df = metadata_df.drop_duplicates(subset=['vector'], keep='first')
     
-    # Process each page
-    data24, meta24 = process_page24_data()
-    all_data.extend(data24)
-    all_metadata.extend(meta24)
-    
-    data25, meta25 = process_page25_data()
-    all_data.extend(data25)
-    all_metadata.extend(meta25)
-    
-    data26, meta26 = process_page26_data()
-    all_data.extend(data26)
-    all_metadata.extend(meta26)
-    
-    data27, meta27 = process_page27_data()
-    all_data.extend(data27)
-    all_metadata.extend(meta27)
-    
-    data31, meta31 = process_page31_data()
-    all_data.extend(data31)
-    all_metadata.extend(meta31)
-    
-    data32, meta32 = process_page32_data()
-    all_data.extend(data32)
-    all_metadata.extend(meta32)
-    
-    data37, meta37 = process_page37_data()
-    all_data.extend(data37)
-    all_metadata.extend(meta37)
-    
-    # Create DataFrames
-    data_df = pd.DataFrame(all_data, columns=['vector', 'ref_date', 'value'])
-    metadata_df = pd.DataFrame(all_metadata, columns=['vector', 'title', 'uom', 'scalar_factor'])
-    
-    # Remove duplicates
-    data_df = data_df.drop_duplicates(subset=['vector', 'ref_date'], keep='first')
-    metadata_df = metadata_df.drop_duplicates(subset=['vector'], keep='first')
+    with metrics.stage("derive"):
+        data_df = add_derived_metrics(data_df)
     
-    # Save to CSV
+    # Save to CSV, in statcan_data/ and its public/ copy; unchanged files are not rewritten
     data_path, metadata_path = get_data_paths()
-    data_df.to_csv(data_path, index=False)
-    metadata_df.to_csv(metadata_path, index=False)
+    with metrics.stage("write"):
+        data_dirs = get_publish_dirs()
+        written = publish_file("data.csv", data_df.to_csv(index=False).encode("utf-8"), data_dirs)
+        written += publish_file("metadata.csv", metadata_df.to_csv(index=False).encode("utf-8"), data_dirs)
+        shards = write_page_shards(data_df, data_dirs)
+        sqlite_changes = write_sqlite(data_df, metadata_df) if sqlite else None
+        now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        snapshot = record_snapshot(data_df, now) if history else None
+    published = (["data.csv", "metadata.csv", "shards.json"] +
+                 [entry['file'] for entry in shards['pages'].values()] +
+                 [entry['binary']['file'] for entry in shards['pages'].values()])
+    compression = compression_summary(published, data_dirs[0])
+    
+    # Record the release each processed table was refreshed at and the spec
+    # each refreshed page was built from. Tables of failed pages are left out
+    # so the next refresh retries them.
+    failed_pids = {pid for page in failed_pages for pid in page_product_ids(page)}
+    for pid, release_time in release_times.items():
+        if pid in failed_pids:
+            continue
+        manifest.setdefault("tables", {})[pid] = {"release_time": release_time, "refreshed_at": now}
+    for page in results:
+        manifest.setdefault("pages", {})[page] = {"spec_hash": page_spec_hash(page), "refreshed_at": now}
+    if release_times or results:
+        store_manifest(manifest)
+    
+    tables_downloaded = cache.fetch_count
+    if full_tables is not None:
+        # Table queries were answered from the full-table downloads
+        tables_downloaded = full_tables.download_count + sum(map(is_vector_url, plan['urls']))
+    report = metrics.report(
+        mode="incremental" if incremental else "full",
+        source=source,
+        cache_mode=cache_mode,
+        workers=workers,
+        tables_downloaded=tables_downloaded,
+        data_rows=len(data_df),
+        metadata_rows=len(metadata_df),
+        failed_pages=failed_pages,
+        stale_vectors=stale_vectors,
+        files_written=written,
+        compression=compression,
+        sqlite=sqlite_changes,
+        snapshot=snapshot,
+    )
+    report_path = write_run_report(report)
     
     print("=" * 60)
-    print(f"Saved {len(data_df)} rows to {data_path}")
-    print(f"Saved {len(metadata_df)} rows to {metadata_path}")
-    print("All data refreshed successfully!")
+    print(f"Downloaded {tables_downloaded} tables")
+    slowest = max(report['tables'], key=lambda table: table.get('fetch_s', 0), default=None)
+    if slowest is not None and 'fetch_s' in slowest:
+        print(f"Slowest table: {slowest['pid']} ({slowest['fetch_s']:.2f}s, "
+              f"{slowest.get('bytes_transferred') or 0:,} bytes transferred)")
+    for path, rows in ((data_path, len(data_df)), (metadata_path, len(metadata_df))):
+        print(f"Saved {rows} rows to {path}" if path in written else f"Unchanged: {path}")
+    print(f"Saved {len(PAGE_SPECS)} page shards to {', '.join(data_dirs)}")
+    if sqlite_changes is not None:
+        changes = sqlite_changes['data']
+        print(f"Updated {get_sqlite_path()}: {changes['inserted']} rows inserted, "
+              f"{changes['updated']} updated, {changes['deleted']} deleted")
+    if snapshot is not None:
+        print(f"Recorded snapshot {snapshot['id']} ({snapshot['kind']}): {snapshot['added']} rows added, "
+              f"{snapshot['changed']} revised, {snapshot['removed']} removed")
+    print("Published sizes (plain, pre-compressed copies):")
+    print_compression_summary(compression)
+    print(f"Run report: {report_path}")
+    if failed_pages:
+        print(f"Refreshed with {len(failed_pages)} failed pages "
+              f"({len(stale_vectors)} stale vectors kept from the previous refresh)")
+    else:
+        print("All data refreshed successfully!")
     print("=" * 60)
     
     return data_df, metadata_df
 
 
 if __name__ == "__main__":
-    refresh_all_data()
+    parser = argparse.ArgumentParser(description="Refresh NRCAN Energy Factbook data from Statistics Canada.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of concurrent StatCan downloads; pages are processed as their tables arrive (default: 1)")
+    parser.add_argument("--cache-mode", choices=CACHE_MODES, default="revalidate",
+                        help="Raw response cache: revalidate with StatCan, replay offline, or disable")
+    parser.add_argument("--offline", dest="cache_mode", action="store_const", const="offline",
+                        help="Shortcut for --cache-mode offline (never touch the network)")
+    parser.add_argument("--measure-memory", action="store_true",
+                        help="Compare peak memory of buffered and streaming downloads for every table, then exit")
+    parser.add_argument("--shards-only", action="store_true",
+                        help="Rewrite the per-page JSON and binary shards from the stored data.csv, then exit")
+    parser.add_argument("--full", action="store_true",
+                        help="Rebuild every page from its full history instead of refreshing incrementally")
+    parser.add_argument("--no-release-check", dest="check_releases", action="store_false",
+                        help="Do not skip tables whose StatCan release time is unchanged")
+    parser.add_argument("--deadline", type=float, default=REFRESH_DEADLINE,
+                        help=f"Total time budget of the refresh in seconds (default: {REFRESH_DEADLINE})")
+    parser.add_argument("--source", choices=SOURCES, default="query",
+                        help="Query each page's slice of a table, or download full tables once and filter them locally")
+    parser.add_argument("--vectors", action="store_true",
+                        help="Request tables read only by vector id (pages 25 and 26) as those vectors from the WDS")
+    parser.add_argument("--sqlite", action="store_true",
+                        help=f"Also apply the refreshed rows to statcan_data/{SQLITE_FILE}")
+    parser.add_argument("--no-history", dest="history", action="store_false",
+                        help="Do not record this refresh in the snapshot history")
+    parser.add_argument("--page-deadline", type=float, default=PAGE_DEADLINE,
+                        help=f"Time budget of each page in seconds, from its first download (default: {PAGE_DEADLINE})")
+    parser.add_argument("--allow-stale", action="store_true",
+                        help="Keep the stored rows of pages that fail or run out of time instead of aborting")
+    parser.add_argument("--revision-window", type=int, default=REVISION_WINDOW,
+                        help=f"Stored years re-requested on an incremental refresh (default: {REVISION_WINDOW})")
+    args = parser.parse_args()
+    if args.measure_memory:
+        for get_url in TABLE_URLS:
+            peaks = measure_fetch_memory(get_url())
+            print(f"{get_url.__name__}: {peaks['rows']} rows, "
+                  f"buffered {peaks['buffered'] / 1e6:.1f} MB, streaming {peaks['streaming'] / 1e6:.1f} MB "
+                  f"({peaks['reduction']:.0%} less)")
+    elif args.shards_only:
+        write_page_shards(add_derived_metrics(load_stored_data()))
+    else:
+        refresh_all_data(workers=args.workers, cache_mode=args.cache_mode,
+                         full=args.full, revision_window=args.revision_window,
+                         check_releases=args.check_releases, deadline=args.deadline,
+                         page_deadline=args.page_deadline, allow_stale=args.allow_stale, source=args.source,
+                         vectors=args.vectors, sqlite=args.sqlite,
+                         history=args.history)
@@ -0,0 +1,186 @@
+"""
+Factbook Data Store
+In-memory, vector-indexed access to the data written by data_retrieval.py.
+
+data.csv is loaded once per process into two contiguous NumPy arrays (years
+and values) sorted by vector and year, with a dict from vector to its slice
+of those arrays. Lookups are a dict hit plus, for year ranges, a binary
+search; every returned array is a read-only view, never a copy.
+
+The process-wide store reloads itself when refresh_all_data() replaces
+data.csv or metadata.csv (their inode, mtime or size changed). A reload
+builds a new VectorStore and swaps it in, so a caller holding the previous
+store keeps a consistent snapshot.
+
+Usage:
+    import factbook_store
+
+    store = factbook_store.get_store()
+    years, values = store.series("page24_total")
+    years, values = store.range("page24_total", 2015, 2020)
+    pairs = store.batch(["page24_oil_gas", "page24_electricity"], start=2015)
+"""
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import data_retrieval
+
+
+# =============================================================================
+# VECTOR STORE
+# =============================================================================
+
+def _read_only(array):
+    array.flags.writeable = False
+    return array
+
+
+class VectorStore:
+    """Read-only, vector-indexed view of data.csv (and metadata.csv).
+
+    years and values hold every row sorted by (vector, year); each vector
+    owns one contiguous [start, stop) slice of both.
+    """
+
+    def __init__(self, data_df, metadata_df=None, signature=None):
+        df = data_df.sort_values(['vector', 'ref_date'], kind='stable')
+        vectors = df['vector'].to_numpy(dtype=object)
+        self.years = _read_only(np.ascontiguousarray(df['ref_date'].to_numpy(dtype=np.int64)))
+        self.values = _read_only(np.ascontiguousarray(df['value'].to_numpy(dtype=np.float64)))
+        self._index = {}
+        if len(vectors):
+            starts = np.flatnonzero(np.r_[True, vectors[1:] != vectors[:-1]])
+            stops = np.r_[starts[1:], len(vectors)]
+            self._index = {str(vectors[start]): (int(start), int(stop))
+                           for start, stop in zip(starts, stops)}
+        self._metadata = {}
+        if metadata_df is not None and len(metadata_df):
+            metadata_df = metadata_df.drop_duplicates('vector', keep='last').set_index('vector')
+            self._metadata = metadata_df.to_dict('index')
+        # (inode, mtime, size) of the files the store was loaded from
+        self.signature = signature
+
+    @classmethod
+    def from_files(cls, data_path, metadata_path=None):
+        """Load a store from a data.csv (and optional metadata.csv) path."""
+        signature = file_signature([data_path, metadata_path])
+        data_df = pd.read_csv(data_path, float_precision="round_trip")
+        metadata_df = None
+        if metadata_path and os.path.exists(metadata_path):
+            metadata_df = pd.read_csv(metadata_path, dtype=str, keep_default_na=False)
+        return cls(data_df, metadata_df, signature)
+
+    def __contains__(self, vector):
+        return vector in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return iter(self._index)
+
+    @property
+    def vectors(self):
+        """Every stored vector, sorted."""
+        return list(self._index)
+
+    def _slice(self, vector):
+        try:
+            return self._index[vector]
+        except KeyError:
+            raise KeyError(f"Unknown vector {vector!r}") from None
+
+    def series(self, vector):
+        """(years, values) of one vector, sorted by year."""
+        start, stop = self._slice(vector)
+        return self.years[start:stop], self.values[start:stop]
+
+    def range(self, vector, start=None, end=None):
+        """(years, values) of one vector for start <= year <= end (None: unbounded)."""
+        years, values = self.series(vector)
+        lo = 0 if start is None else int(np.searchsorted(years, start, side='left'))
+        hi = len(years) if end is None else int(np.searchsorted(years, end, side='right'))
+        return years[lo:hi], values[lo:hi]
+
+    def batch(self, vectors, start=None, end=None):
+        """{vector: (years, values)} for several vectors over the same year range."""
+        return {vector: self.range(vector, start, end) for vector in vectors}
+
+    def value(self, vector, year):
+        """The value of vector in year, or None if that year is not stored."""
+        years, values = self.series(vector)
+        i = int(np.searchsorted(years, year))
+        if i < len(years) and years[i] == year:
+            return float(values[i])
+        return None
+
+    def metadata(self, vector):
+        """{'title', 'uom', 'scalar_factor'} of vector, or {} without metadata."""
+        self._slice(vector)
+        return dict(self._metadata.get(vector, {}))
+
+    def to_frame(self, vectors=None, start=None, end=None):
+        """Long DataFrame (vector, ref_date, value) like data.csv, for pandas callers."""
+        pairs = self.batch(self.vectors if vectors is None else vectors, start, end)
+        return pd.DataFrame({
+            'vector': np.repeat(list(pairs), [len(years) for years, _ in pairs.values()]),
+            'ref_date': np.concatenate([years for years, _ in pairs.values()] or [self.years[:0]]),
+            'value': np.concatenate([values for _, values in pairs.values()] or [self.values[:0]]),
+        })
+
+
+# =============================================================================
+# PROCESS-WIDE STORE
+# =============================================================================
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def store_paths(data_dir=None):
+    """(data.csv, metadata.csv) paths in data_dir (default: data_retrieval.DATA_DIR)."""
+    data_dir = data_dir or data_retrieval.DATA_DIR
+    return os.path.join(data_dir, "data.csv"), os.path.join(data_dir, "metadata.csv")
+
+
+def file_signature(paths):
+    """(path, inode, mtime, size) per path; changes whenever a file is replaced."""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path) if path else None
+        except FileNotFoundError:
+            stat = None
+        signature.append((path, stat and (stat.st_ino, stat.st_mtime_ns, stat.st_size)))
+    return tuple(signature)
+
+
+def get_store(data_dir=None, check=True):
+    """The process-wide VectorStore, loaded on first use.
+
+    With check (the default) the data files are stat'ed on every call and
+    the store is reloaded if refresh_all_data() replaced them since.
+    """
+    store = _store
+    if store is not None and not check:
+        return store
+    paths = store_paths(data_dir)
+    if store is not None and store.signature == file_signature(paths):
+        return store
+    return reload_store(data_dir)
+
+
+def reload_store(data_dir=None):
+    """Load the process-wide store from disk now and return it."""
+    global _store
+    paths = store_paths(data_dir)
+    with _store_lock:
+        # Another thread may have reloaded while this one waited
+        if _store is not None and _store.signature == file_signature(paths):
+            return _store
+        _store = VectorStore.from_files(*paths)
+        return _store
@@ -75,7 +75,7 @@ const Page25 = () => {
 
         CATEGORY_ORDER.forEach(cat => {
             const value = currentYearData[cat] || 0;
-            const pct = total > 0 ? (value / total) * 100 : 0;
+            const pct = currentYearData[`${cat}_share`] || 0;
             if (value >= 0) { 
                 values.push(value);
                 colors.push(COLORS[cat]);
@@ -144,7 +144,7 @@ const Page25 = () => {
 
     const getSubtitleText = () => {
         if (!currentYearData) return '';
-        const fuelPct = ((currentYearData['fuel_energy_pipelines'] || 0) / currentYearData.total) * 100;
+        const fuelPct = currentYearData.fuel_energy_pipelines_share || 0;
         const fuelValueBillions = (currentYearData['fuel_energy_pipelines'] || 0) / 1000;
         const billionText = getText('billion', lang);
         const dollarsText = lang === 'en' ? 'dollars' : 'dollars';
@@ -155,7 +155,7 @@ const Page25 = () => {
 
     const getSubtitle = () => {
         if (!currentYearData) return null;
-        const fuelPct = ((currentYearData['fuel_energy_pipelines'] || 0) / currentYearData.total) * 100;
+        const fuelPct = currentYearData.fuel_energy_pipelines_share || 0;
         const fuelValueBillions = (currentYearData['fuel_energy_pipelines'] || 0) / 1000;
         const billionText = getText('billion', lang);
         const valueDisplay = lang === 'en'
@@ -48,18 +48,17 @@ const Page32 = () => {
 
     // Calculate bullet point values from investment data
     const bulletValues = useMemo(() => {
-        if (investmentData.length < 2) return null;
-        
-        const latestYear = investmentData[investmentData.length - 1];
-        const prevYear = investmentData[investmentData.length - 2];
+        // Latest year with growth over the previous calendar year, precomputed by
+        // data_retrieval.py (a year whose previous year is missing has none)
+        const latestYear = [...investmentData].reverse()
+            .find(d => d.fdi_yoy !== undefined && d.cdia_yoy !== undefined);
+        if (!latestYear) return null;
         
         const fdiLatest = (latestYear.fdi || 0) / 1000; // Convert to billions
-        const fdiPrev = (prevYear.fdi || 0) / 1000;
         const cdiaLatest = (latestYear.cdia || 0) / 1000;
-        const cdiaPrev = (prevYear.cdia || 0) / 1000;
         
-        const fdiGrowth = fdiPrev > 0 ? ((fdiLatest - fdiPrev) / fdiPrev * 100) : 0;
-        const cdiaGrowth = cdiaPrev > 0 ? ((cdiaLatest - cdiaPrev) / cdiaPrev * 100) : 0;
+        const fdiGrowth = latestYear.fdi_yoy;
+        const cdiaGrowth = latestYear.cdia_yoy;
         
         // Energy industry share of overall FDI - approximately 10%
         const energyShare = 10;
@@ -70,7 +69,7 @@ const Page32 = () => {
         
         return {
             year: latestYear.year,
-            prevYear: prevYear.year,
+            prevYear: latestYear.year - 1,
             fdi: Math.round(fdiLatest),
             fdiGrowth: fdiGrowth.toFixed(1),
             energyShare,
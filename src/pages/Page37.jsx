@@ -89,17 +89,17 @@ const Page37 = () => {
         const electricTotal = currentYearData.electric_total || 0;
         const naturalGasTotal = currentYearData.natural_gas_total || 0;
         const petroleumTotal = currentYearData.petroleum_total || 0;
-        const petroleumPollution = currentYearData.petroleum_pollution || 0;
         
         // Energy sector total (oil+gas + electric + natural gas distribution + petroleum)
         const energySectorTotal = oilGasTotal + electricTotal + naturalGasTotal + petroleumTotal;
         
         // Petroleum pollution abatement percentage (air + wastewater + solid waste + soil as % of total)
-        const petroleumPollutionPct = petroleumTotal > 0 ? Math.round((petroleumPollution / petroleumTotal) * 100) : 0;
+        const petroleumPollutionPct = Math.round(currentYearData.petroleum_pollution_share || 0);
         
-        // Percentage of all industries
-        const energySectorPct = allIndustriesTotal > 0 ? (energySectorTotal / allIndustriesTotal) * 100 : 0;
-        const oilGasPct = allIndustriesTotal > 0 ? (oilGasTotal / allIndustriesTotal) * 100 : 0;
+        // Percentage of all industries (shares precomputed by data_retrieval.py)
+        const oilGasPct = currentYearData.oil_gas_total_share || 0;
+        const energySectorPct = oilGasPct + (currentYearData.electric_total_share || 0) +
+            (currentYearData.natural_gas_total_share || 0) + (currentYearData.petroleum_total_share || 0);
         
         return {
             energySectorTotal,
@@ -160,7 +160,7 @@ const Page37 = () => {
 
         CATEGORY_ORDER.forEach(cat => {
             const value = currentYearData[catMapping[cat]] || 0;
-            const pct = oilGasTotal > 0 ? (value / oilGasTotal) * 100 : 0;
+            const pct = currentYearData[`${catMapping[cat]}_share`] || 0;
             if (value >= 0) {
                 values.push(value);
                 colors.push(COLORS[cat]);
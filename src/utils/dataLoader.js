@@ -1,17 +1,34 @@
 /**
  * Data Loader Utility
  * 
- * Loads pre-calculated data from data.csv stored in public/statcan_data/
+ * Loads pre-calculated data stored in public/statcan_data/
  * All calculations are done in data_retrieval.py - this module just loads and parses.
  * 
+ * Each page loads only its own shard listed in shards.json: the binary one
+ * (e.g. page24.bin), whose numbers are read as typed arrays instead of parsed
+ * from text before the page rows are built, or else the JSON one (e.g.
+ * page24.json). If the shards are unavailable, the combined data.csv is
+ * loaded instead.
+ * 
  * Data is stored with virtual vectors like:
  * - page24_oil_gas, page24_electricity, page24_other, page24_total
  * - page25_fuel_energy_pipelines, page25_transport, etc.
  * - page26_jobs, page26_employment_income, page26_gdp, page26_investment_value
+ * 
+ * Percentages the pages display are precomputed as derived vectors (see
+ * DERIVED METRICS in data_retrieval.py) and appear as extra row fields:
+ * <part>_share (percent of its total) and <key>_yoy (percent change from
+ * the previous calendar year).
  */
 
 // Cache for loaded data
 let dataCache = null;
+let shardManifestPromise = null;
+const pageCache = {};
+
+// Binary shard layout, written by build_binary_data() in data_retrieval.py
+const BINARY_MAGIC = 'NRCB';
+const BINARY_VERSION = 1;
 
 /**
  * Parse CSV text into array of objects
@@ -74,76 +91,167 @@ async function loadAllData() {
 }
 
 /**
- * Get capital expenditures data for Page 24
- * Returns array of objects: { year, oil_gas, electricity, other, total }
+ * Load the shard manifest (cached). Resolves to null if there is none.
  */
-export async function getCapitalExpendituresData() {
-    const allData = await loadAllData();
-    
-    // Filter for page24 vectors
-    const page24Data = allData.filter(row => row.vector && row.vector.startsWith('page24_'));
+function loadShardManifest() {
+    if (shardManifestPromise === null) {
+        const baseUrl = import.meta.env.BASE_URL || '/';
+        shardManifestPromise = fetch(`${baseUrl}statcan_data/shards.json`, { cache: 'no-cache' })
+            .then(response => (response.ok ? response.json() : null))
+            .catch(() => null);
+    }
+    return shardManifestPromise;
+}
+
+/**
+ * Decode a binary shard into typed arrays indexed by vector:
+ * { page24_oil_gas: { years: Int16Array, values: Float64Array }, ... }
+ * The arrays are views on the downloaded buffer, nothing is copied. Typed
+ * arrays use the platform byte order, which is little-endian like the file
+ * on every browser platform.
+ */
+function decodeBinaryData(buffer) {
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if (magic !== BINARY_MAGIC || view.getUint32(4, true) !== BINARY_VERSION) {
+        throw new Error('Unsupported binary shard format');
+    }
+    const headerLength = view.getUint32(8, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 12, headerLength)));
+    const base = Math.ceil((12 + headerLength) / 8) * 8;
     
-    // Group by year
+    const vectors = {};
+    Object.entries(header.vectors).forEach(([vector, [count, valuesOffset, yearsOffset]]) => {
+        vectors[vector] = {
+            years: new Int16Array(buffer, base + yearsOffset, count),
+            values: new Float64Array(buffer, base + valuesOffset, count),
+        };
+    });
+    return vectors;
+}
+
+/**
+ * Fetch and decode one binary file listed in shards.json.
+ * Resolves to null if it cannot be loaded.
+ */
+async function loadBinary(entry) {
+    const baseUrl = import.meta.env.BASE_URL || '/';
+    const response = await fetch(`${baseUrl}statcan_data/${entry.file}?v=${entry.hash}`);
+    return response.ok ? decodeBinaryData(await response.arrayBuffer()) : null;
+}
+
+/**
+ * Turn a page's typed-array vectors into array of objects sorted by year
+ * Years without a value for a vector leave that field out, like data.csv.
+ */
+function vectorsToRows(vectors, page) {
+    const prefix = `${page}_`;
     const yearMap = {};
-    page24Data.forEach(row => {
-        const year = row.ref_date;
-        if (!yearMap[year]) {
-            yearMap[year] = { year };
+    Object.entries(vectors).forEach(([vector, { years, values }]) => {
+        if (!vector.startsWith(prefix)) {
+            return;
+        }
+        const field = vector.slice(prefix.length);
+        for (let i = 0; i < years.length; i++) {
+            const year = years[i];
+            if (!yearMap[year]) {
+                yearMap[year] = { year };
+            }
+            yearMap[year][field] = values[i];
         }
-        // Extract field name from vector (e.g., 'page24_oil_gas' -> 'oil_gas')
-        const field = row.vector.replace('page24_', '');
-        yearMap[year][field] = row.value;
     });
-    
     return Object.values(yearMap).sort((a, b) => a.year - b.year);
 }
 
 /**
- * Get infrastructure data for Page 25
- * Returns array of objects: { year, fuel_energy_pipelines, transport, health_housing, education, public_safety, environmental, total }
+ * Turn a page shard into array of objects: { year, <series>... }
+ * Years without a value for a series leave that field out, like data.csv.
  */
-export async function getInfrastructureData() {
-    const allData = await loadAllData();
+function shardToRows(shard) {
+    return shard.years.map((year, i) => {
+        const row = { year };
+        Object.entries(shard.series).forEach(([field, values]) => {
+            if (values[i] !== null) {
+                row[field] = values[i];
+            }
+        });
+        return row;
+    });
+}
+
+/**
+ * Get one page's data as array of objects sorted by year
+ * Reads the page's binary shard; falls back to its JSON shard, then data.csv.
+ * Each call returns fresh row objects, so callers may modify them.
+ */
+async function loadPageData(page) {
+    if (!pageCache[page]) {
+        pageCache[page] = loadPageDataUncached(page).catch(error => {
+            delete pageCache[page];
+            throw error;
+        });
+    }
+    const rows = await pageCache[page];
+    return rows.map(row => ({ ...row }));
+}
+
+async function loadPageDataUncached(page) {
+    const manifest = await loadShardManifest();
+    const entry = manifest && manifest.pages && manifest.pages[page];
+    if (entry && entry.binary) {
+        const vectors = await loadBinary(entry.binary).catch(() => null);
+        if (vectors) {
+            return vectorsToRows(vectors, page);
+        }
+    }
+    if (entry) {
+        const baseUrl = import.meta.env.BASE_URL || '/';
+        const response = await fetch(`${baseUrl}statcan_data/${entry.file}?v=${entry.hash}`);
+        if (response.ok) {
+            return shardToRows(await response.json());
+        }
+    }
     
-    // Filter for page25 vectors
-    const page25Data = allData.filter(row => row.vector && row.vector.startsWith('page25_'));
+    const allData = await loadAllData();
+    const prefix = `${page}_`;
     
     // Group by year
     const yearMap = {};
-    page25Data.forEach(row => {
+    allData.filter(row => row.vector && row.vector.startsWith(prefix)).forEach(row => {
         const year = row.ref_date;
         if (!yearMap[year]) {
             yearMap[year] = { year };
         }
-        const field = row.vector.replace('page25_', '');
+        // Extract field name from vector (e.g., 'page24_oil_gas' -> 'oil_gas')
+        const field = row.vector.slice(prefix.length);
         yearMap[year][field] = row.value;
     });
     
     return Object.values(yearMap).sort((a, b) => a.year - b.year);
 }
 
+/**
+ * Get capital expenditures data for Page 24
+ * Returns array of objects: { year, oil_gas, electricity, other, total }
+ */
+export async function getCapitalExpendituresData() {
+    return loadPageData('page24');
+}
+
+/**
+ * Get infrastructure data for Page 25
+ * Returns array of objects: { year, fuel_energy_pipelines, transport, health_housing, education, public_safety, environmental, total }
+ */
+export async function getInfrastructureData() {
+    return loadPageData('page25');
+}
+
 /**
  * Get economic contributions data for Page 26
  * Returns array of objects: { year, jobs, employment_income, gdp, investment_value }
  */
 export async function getEconomicContributionsData() {
-    const allData = await loadAllData();
-    
-    // Filter for page26 vectors
-    const page26Data = allData.filter(row => row.vector && row.vector.startsWith('page26_'));
-    
-    // Group by year
-    const yearMap = {};
-    page26Data.forEach(row => {
-        const year = row.ref_date;
-        if (!yearMap[year]) {
-            yearMap[year] = { year };
-        }
-        const field = row.vector.replace('page26_', '');
-        yearMap[year][field] = row.value;
-    });
-    
-    return Object.values(yearMap).sort((a, b) => a.year - b.year);
+    return loadPageData('page26');
 }
 
 /**
@@ -152,23 +260,7 @@ export async function getEconomicContributionsData() {
  * { year, transmission_distribution, pipelines, nuclear, other_electric, hydraulic, wind_solar, steam_thermal, total }
  */
 export async function getInvestmentByAssetData() {
-    const allData = await loadAllData();
-    
-    // Filter for page27 vectors
-    const page27Data = allData.filter(row => row.vector && row.vector.startsWith('page27_'));
-    
-    // Group by year
-    const yearMap = {};
-    page27Data.forEach(row => {
-        const year = row.ref_date;
-        if (!yearMap[year]) {
-            yearMap[year] = { year };
-        }
-        const field = row.vector.replace('page27_', '');
-        yearMap[year][field] = row.value;
-    });
-    
-    return Object.values(yearMap).sort((a, b) => a.year - b.year);
+    return loadPageData('page27');
 }
 
 /**
@@ -179,23 +271,7 @@ export async function getInvestmentByAssetData() {
  * Values are in millions of dollars
  */
 export async function getInternationalInvestmentData() {
-    const allData = await loadAllData();
-    
-    // Filter for page31 vectors
-    const page31Data = allData.filter(row => row.vector && row.vector.startsWith('page31_'));
-    
-    // Group by year
-    const yearMap = {};
-    page31Data.forEach(row => {
-        const year = row.ref_date;
-        if (!yearMap[year]) {
-            yearMap[year] = { year };
-        }
-        const field = row.vector.replace('page31_', '');
-        yearMap[year][field] = row.value;
-    });
-    
-    return Object.values(yearMap).sort((a, b) => a.year - b.year);
+    return loadPageData('page31');
 }
 
 /**
@@ -204,23 +280,7 @@ export async function getInternationalInvestmentData() {
  * Values are percentages
  */
 export async function getForeignControlData() {
-    const allData = await loadAllData();
-    
-    // Filter for page32 vectors
-    const page32Data = allData.filter(row => row.vector && row.vector.startsWith('page32_'));
-    
-    // Group by year
-    const yearMap = {};
-    page32Data.forEach(row => {
-        const year = row.ref_date;
-        if (!yearMap[year]) {
-            yearMap[year] = { year };
-        }
-        const field = row.vector.replace('page32_', '');
-        yearMap[year][field] = row.value;
-    });
-    
-    return Object.values(yearMap).sort((a, b) => a.year - b.year);
+    return loadPageData('page32');
 }
 
 /**
@@ -233,21 +293,5 @@ export async function getForeignControlData() {
  * Values are in millions of dollars
  */
 export async function getEnvironmentalProtectionData() {
-    const allData = await loadAllData();
-    
-    // Filter for page37 vectors
-    const page37Data = allData.filter(row => row.vector && row.vector.startsWith('page37_'));
-    
-    // Group by year
-    const yearMap = {};
-    page37Data.forEach(row => {
-        const year = row.ref_date;
-        if (!yearMap[year]) {
-            yearMap[year] = { year };
-        }
-        const field = row.vector.replace('page37_', '');
-        yearMap[year][field] = row.value;
-    });
-    
-    return Object.values(yearMap).sort((a, b) => a.year - b.year);
+    return loadPageData('page37');
 }